@@ -1,20 +1,94 @@
 # app.py - Elegant Fraud Detection System
 import os
-from flask import Flask, request, jsonify, render_template_string
+import gzip
+import hashlib
+from flask import Flask, Response, g, request, jsonify, render_template_string
 from flask_cors import CORS
 import json
-import random
+import math
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from datetime import datetime
-import openai
-
-app = Flask(__name__)
+import click
+import numpy as np
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; pages are still served gzip-encoded
+    brotli = None
+from store import HistoricalStore
+from live_history import LiveHistory
+from synthetic import synthetic_store
+from shared_store import SharedStore, file_source, publish
+from session_store import create_session_store
+from records import (AGE_ANOMALY, AMOUNT_ANOMALY, CLASSIFICATIONS, HIGH_RISK, LEGITIMATE, PATTERN_ANOMALY,
+                     PREV_ANOMALY, SUSPICIOUS, FetchResult, HoundResult, JudgeResult, anomaly_messages, recommendation)
+from llm_cache import ResponseCache, cache_key
+import metrics
+from metrics import timed
+from rules import RuleWatcher
+from velocity import VelocityTracker
+from sketches import VelocitySketches
+
+app = Flask(__name__, static_folder=None)
 CORS(app)
 
-# Configure OpenAI
-openai.api_key = os.environ.get('OPENAI_API_KEY', '')
-
-# Store session data
-sessions = {}
+# Configure OpenAI. The openai package and its HTTP stack are imported on the
+# first LLM call, so workers that never chat (or have no key) never load them.
+OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
+_openai = None
+
+def openai_module():
+    global _openai
+    if _openai is None:
+        import openai
+        openai.api_key = OPENAI_API_KEY
+        _openai = openai
+    return _openai
+
+# LLM calls run on a small bounded pool so a slow upstream never holds a
+# request past its deadline; at most LLM_MAX_PENDING calls run or wait at once
+LLM_DEADLINE_SECONDS = float(os.environ.get('LLM_DEADLINE_SECONDS', 8))
+LLM_MAX_WORKERS = int(os.environ.get('LLM_MAX_WORKERS', 4))
+LLM_MAX_PENDING = int(os.environ.get('LLM_MAX_PENDING', 16))
+llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_WORKERS, thread_name_prefix='llm')
+llm_slots = threading.BoundedSemaphore(LLM_MAX_PENDING)
+
+# Analysts ask the same questions about the same transactions; answer repeats
+# from cache. LLM_CACHE_PATH adds an on-disk tier that survives restarts,
+# capped at LLM_CACHE_DISK_MAX_ENTRIES rows (LLM_CACHE_MAX_ENTRIES by default).
+llm_cache = ResponseCache(
+    max_entries=int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 2048)),
+    ttl_seconds=float(os.environ.get('LLM_CACHE_TTL_SECONDS', 86400)),
+    disk_path=os.environ.get('LLM_CACHE_PATH') or None,
+    disk_max_entries=int(os.environ['LLM_CACHE_DISK_MAX_ENTRIES']) if os.environ.get('LLM_CACHE_DISK_MAX_ENTRIES') else None
+)
+
+# Store session data - bounded by entry count and idle time. The in-memory
+# backend is per process; use SESSION_BACKEND=sqlite with more than one worker.
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'memory')
+session_options = {
+    'max_entries': int(os.environ.get('SESSION_MAX_ENTRIES', 10000)),
+    'ttl_seconds': float(os.environ.get('SESSION_TTL_SECONDS', 3600))
+}
+if SESSION_BACKEND == 'sqlite':
+    session_options['path'] = os.environ.get('SESSION_DB_PATH', 'sessions.db')
+sessions = create_session_store(SESSION_BACKEND, **session_options)
+
+# Per-user transaction velocity the server observes itself, as Hound features.
+# Only the live single-transaction routes record into it; batch and offline
+# scoring read it, so scoring a file never changes the counts. Like the
+# memory session backend it is per process, so with several workers each one
+# counts only the transactions it served.
+velocity = VelocityTracker(max_users=int(os.environ.get('VELOCITY_MAX_USERS', 100000)))
+# Fixed-memory sketches for keys with too many values to count exactly (devices, locations)
+velocity_sketches = VelocitySketches(
+    width=int(os.environ.get('VELOCITY_SKETCH_WIDTH', 1 << 18)),
+    distinct_width=int(os.environ.get('VELOCITY_SKETCH_DISTINCT_WIDTH', 1 << 15))
+)
 
 # Elegant Modern HTML Template
 HTML_TEMPLATE = '''
@@ -25,650 +99,7 @@ HTML_TEMPLATE = '''
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Federated Intelligence - MIT</title>
     <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap" rel="stylesheet">
-    <style>
-        :root {
-            --primary: #6366f1;
-            --primary-dark: #4f46e5;
-            --secondary: #8b5cf6;
-            --success: #10b981;
-            --warning: #f59e0b;
-            --danger: #ef4444;
-            --dark: #1e293b;
-            --gray: #64748b;
-            --light: #f1f5f9;
-            --white: #ffffff;
-            --shadow: 0 20px 25px -5px rgb(0 0 0 / 0.1), 0 8px 10px -6px rgb(0 0 0 / 0.1);
-            --shadow-lg: 0 25px 50px -12px rgb(0 0 0 / 0.25);
-        }
-
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-
-        body {
-            font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            position: relative;
-            overflow-x: hidden;
-        }
-
-        /* Animated Background */
-        body::before {
-            content: '';
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background-image: 
-                radial-gradient(circle at 20% 80%, rgba(139, 92, 246, 0.3) 0%, transparent 50%),
-                radial-gradient(circle at 80% 20%, rgba(99, 102, 241, 0.3) 0%, transparent 50%),
-                radial-gradient(circle at 40% 40%, rgba(236, 72, 153, 0.2) 0%, transparent 50%);
-            animation: backgroundShift 20s ease infinite;
-            z-index: -1;
-        }
-
-        @keyframes backgroundShift {
-            0%, 100% { transform: translate(0, 0) rotate(0deg); }
-            33% { transform: translate(-20px, -20px) rotate(120deg); }
-            66% { transform: translate(20px, -10px) rotate(240deg); }
-        }
-
-        .container {
-            max-width: 1400px;
-            margin: 0 auto;
-            padding: 2rem;
-            position: relative;
-            z-index: 1;
-        }
-
-        /* Header */
-        .header {
-            text-align: center;
-            color: white;
-            margin-bottom: 3rem;
-            animation: fadeInDown 0.8s ease;
-        }
-
-        .header h1 {
-            font-size: 3.5rem;
-            font-weight: 800;
-            margin-bottom: 0.5rem;
-            background: linear-gradient(to right, #ffffff, #e0e7ff);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            text-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }
-
-        .header .subtitle {
-            font-size: 1.25rem;
-            opacity: 0.95;
-            font-weight: 300;
-            letter-spacing: 0.5px;
-        }
-
-        .header .badge {
-            display: inline-block;
-            background: rgba(255, 255, 255, 0.2);
-            backdrop-filter: blur(10px);
-            padding: 0.5rem 1.5rem;
-            border-radius: 2rem;
-            margin-top: 1rem;
-            font-size: 0.875rem;
-            font-weight: 500;
-            border: 1px solid rgba(255, 255, 255, 0.3);
-        }
-
-        /* Main Grid */
-        .main-grid {
-            display: grid;
-            grid-template-columns: 400px 1fr;
-            gap: 2rem;
-            animation: fadeInUp 0.8s ease;
-        }
-
-        @media (max-width: 1024px) {
-            .main-grid {
-                grid-template-columns: 1fr;
-            }
-        }
-
-        /* Glass Panel */
-        .glass-panel {
-            background: rgba(255, 255, 255, 0.95);
-            backdrop-filter: blur(10px);
-            border-radius: 24px;
-            padding: 2rem;
-            box-shadow: var(--shadow-lg);
-            border: 1px solid rgba(255, 255, 255, 0.5);
-            transition: transform 0.3s ease, box-shadow 0.3s ease;
-        }
-
-        .glass-panel:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 30px 60px -15px rgb(0 0 0 / 0.3);
-        }
-
-        .panel-title {
-            font-size: 1.5rem;
-            font-weight: 700;
-            color: var(--dark);
-            margin-bottom: 1.5rem;
-            display: flex;
-            align-items: center;
-            gap: 0.75rem;
-        }
-
-        .panel-title::before {
-            content: '';
-            width: 4px;
-            height: 24px;
-            background: linear-gradient(to bottom, var(--primary), var(--secondary));
-            border-radius: 2px;
-        }
-
-        /* Form Styles */
-        .form-group {
-            margin-bottom: 1.25rem;
-        }
-
-        .form-label {
-            display: block;
-            font-size: 0.875rem;
-            font-weight: 600;
-            color: var(--gray);
-            margin-bottom: 0.5rem;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-        }
-
-        .form-input {
-            width: 100%;
-            padding: 0.875rem 1rem;
-            border: 2px solid var(--light);
-            border-radius: 12px;
-            font-size: 1rem;
-            font-weight: 500;
-            transition: all 0.3s ease;
-            background: var(--white);
-        }
-
-        .form-input:focus {
-            outline: none;
-            border-color: var(--primary);
-            box-shadow: 0 0 0 4px rgba(99, 102, 241, 0.1);
-            transform: translateY(-1px);
-        }
-
-        select.form-input {
-            cursor: pointer;
-        }
-
-        /* Modern Button */
-        .btn {
-            position: relative;
-            padding: 1rem 2rem;
-            border: none;
-            border-radius: 12px;
-            font-size: 1rem;
-            font-weight: 600;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-            overflow: hidden;
-        }
-
-        .btn::before {
-            content: '';
-            position: absolute;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: linear-gradient(45deg, transparent, rgba(255, 255, 255, 0.3), transparent);
-            transform: translateX(-100%);
-            transition: transform 0.6s;
-        }
-
-        .btn:hover::before {
-            transform: translateX(100%);
-        }
-
-        .btn-primary {
-            background: linear-gradient(135deg, var(--primary) 0%, var(--secondary) 100%);
-            color: white;
-            width: 100%;
-            box-shadow: 0 4px 15px rgba(99, 102, 241, 0.3);
-        }
-
-        .btn-primary:hover:not(:disabled) {
-            transform: translateY(-2px);
-            box-shadow: 0 6px 20px rgba(99, 102, 241, 0.4);
-        }
-
-        .btn-primary:disabled {
-            opacity: 0.5;
-            cursor: not-allowed;
-        }
-
-        .btn-small {
-            padding: 0.625rem 1.25rem;
-            font-size: 0.875rem;
-            width: auto;
-        }
-
-        .btn-success {
-            background: linear-gradient(135deg, var(--success) 0%, #059669 100%);
-        }
-
-        .btn-warning {
-            background: linear-gradient(135deg, var(--warning) 0%, #d97706 100%);
-        }
-
-        .btn-danger {
-            background: linear-gradient(135deg, var(--danger) 0%, #dc2626 100%);
-        }
-
-        /* Agent Cards */
-        .agent-card {
-            background: linear-gradient(145deg, #f8fafc, #ffffff);
-            border-radius: 20px;
-            padding: 1.5rem;
-            margin-bottom: 1.5rem;
-            border: 2px solid transparent;
-            transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1);
-            position: relative;
-            overflow: hidden;
-        }
-
-        .agent-card::before {
-            content: '';
-            position: absolute;
-            top: 0;
-            left: -100%;
-            width: 100%;
-            height: 100%;
-            background: linear-gradient(90deg, transparent, rgba(99, 102, 241, 0.1), transparent);
-            transition: left 0.6s ease;
-        }
-
-        .agent-card.active {
-            border-color: var(--primary);
-            box-shadow: 0 10px 30px rgba(99, 102, 241, 0.15);
-            transform: scale(1.02);
-        }
-
-        .agent-card.active::before {
-            left: 100%;
-        }
-
-        .agent-card.completed {
-            border-color: var(--success);
-        }
-
-        .agent-header {
-            display: flex;
-            align-items: center;
-            gap: 1rem;
-            margin-bottom: 1rem;
-        }
-
-        .agent-icon {
-            width: 48px;
-            height: 48px;
-            background: linear-gradient(135deg, var(--primary), var(--secondary));
-            border-radius: 14px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 1.5rem;
-            box-shadow: 0 4px 12px rgba(99, 102, 241, 0.3);
-            transition: transform 0.3s ease;
-        }
-
-        .agent-card.active .agent-icon {
-            animation: pulse 2s infinite;
-        }
-
-        @keyframes pulse {
-            0%, 100% { transform: scale(1); }
-            50% { transform: scale(1.1); }
-        }
-
-        .agent-info {
-            flex: 1;
-        }
-
-        .agent-name {
-            font-size: 1.125rem;
-            font-weight: 700;
-            color: var(--dark);
-        }
-
-        .agent-role {
-            font-size: 0.875rem;
-            color: var(--gray);
-        }
-
-        .agent-status {
-            padding: 0.375rem 0.875rem;
-            border-radius: 20px;
-            font-size: 0.75rem;
-            font-weight: 600;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-        }
-
-        .status-pending {
-            background: var(--light);
-            color: var(--gray);
-        }
-
-        .status-active {
-            background: linear-gradient(135deg, var(--primary), var(--secondary));
-            color: white;
-            animation: shimmer 2s infinite;
-        }
-
-        @keyframes shimmer {
-            0%, 100% { opacity: 1; }
-            50% { opacity: 0.8; }
-        }
-
-        .status-completed {
-            background: var(--success);
-            color: white;
-        }
-
-        /* Agent Output */
-        .agent-output {
-            margin-top: 1rem;
-            padding: 1.25rem;
-            background: rgba(99, 102, 241, 0.05);
-            border-radius: 12px;
-            border: 1px solid rgba(99, 102, 241, 0.1);
-            display: none;
-            animation: slideDown 0.4s ease;
-        }
-
-        .agent-output.show {
-            display: block;
-        }
-
-        @keyframes slideDown {
-            from {
-                opacity: 0;
-                transform: translateY(-10px);
-            }
-            to {
-                opacity: 1;
-                transform: translateY(0);
-            }
-        }
-
-        /* Chat Interface */
-        .chat-interface {
-            margin-top: 1rem;
-            padding: 1rem;
-            background: rgba(241, 245, 249, 0.5);
-            border-radius: 12px;
-            display: none;
-        }
-
-        .chat-interface.show {
-            display: block;
-            animation: fadeIn 0.4s ease;
-        }
-
-        .chat-messages {
-            max-height: 200px;
-            overflow-y: auto;
-            margin-bottom: 1rem;
-            padding: 0.75rem;
-            background: white;
-            border-radius: 8px;
-        }
-
-        .chat-messages::-webkit-scrollbar {
-            width: 6px;
-        }
-
-        .chat-messages::-webkit-scrollbar-track {
-            background: var(--light);
-            border-radius: 3px;
-        }
-
-        .chat-messages::-webkit-scrollbar-thumb {
-            background: var(--primary);
-            border-radius: 3px;
-        }
-
-        .chat-message {
-            margin-bottom: 0.75rem;
-            padding: 0.75rem;
-            border-radius: 8px;
-            animation: messageSlide 0.3s ease;
-        }
-
-        @keyframes messageSlide {
-            from {
-                opacity: 0;
-                transform: translateX(-10px);
-            }
-            to {
-                opacity: 1;
-                transform: translateX(0);
-            }
-        }
-
-        .message-agent {
-            background: linear-gradient(135deg, rgba(99, 102, 241, 0.1), rgba(139, 92, 246, 0.1));
-            border-left: 3px solid var(--primary);
-        }
-
-        .message-user {
-            background: var(--light);
-            text-align: right;
-            border-right: 3px solid var(--secondary);
-        }
-
-        .chat-input-group {
-            display: flex;
-            gap: 0.75rem;
-        }
-
-        .chat-input {
-            flex: 1;
-            padding: 0.75rem;
-            border: 2px solid var(--light);
-            border-radius: 8px;
-            transition: all 0.3s ease;
-        }
-
-        .chat-input:focus {
-            outline: none;
-            border-color: var(--primary);
-            box-shadow: 0 0 0 3px rgba(99, 102, 241, 0.1);
-        }
-
-        /* Alert Styles */
-        .alert {
-            padding: 1rem 1.25rem;
-            border-radius: 12px;
-            margin: 1rem 0;
-            display: flex;
-            align-items: center;
-            gap: 0.75rem;
-            animation: alertSlide 0.4s ease;
-        }
-
-        @keyframes alertSlide {
-            from {
-                opacity: 0;
-                transform: translateY(-10px);
-            }
-            to {
-                opacity: 1;
-                transform: translateY(0);
-            }
-        }
-
-        .alert-danger {
-            background: linear-gradient(135deg, rgba(239, 68, 68, 0.1), rgba(239, 68, 68, 0.05));
-            border-left: 4px solid var(--danger);
-            color: #991b1b;
-        }
-
-        .alert-warning {
-            background: linear-gradient(135deg, rgba(245, 158, 11, 0.1), rgba(245, 158, 11, 0.05));
-            border-left: 4px solid var(--warning);
-            color: #92400e;
-        }
-
-        .alert-success {
-            background: linear-gradient(135deg, rgba(16, 185, 129, 0.1), rgba(16, 185, 129, 0.05));
-            border-left: 4px solid var(--success);
-            color: #064e3b;
-        }
-
-        /* Metric Cards */
-        .metric-card {
-            background: white;
-            padding: 1.25rem;
-            border-radius: 12px;
-            margin: 0.75rem 0;
-            border-left: 4px solid;
-            border-image: linear-gradient(to bottom, var(--primary), var(--secondary)) 1;
-            transition: transform 0.3s ease;
-        }
-
-        .metric-card:hover {
-            transform: translateX(4px);
-        }
-
-        .metric-label {
-            font-size: 0.75rem;
-            font-weight: 600;
-            color: var(--gray);
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-            margin-bottom: 0.5rem;
-        }
-
-        .metric-value {
-            font-size: 2rem;
-            font-weight: 800;
-            background: linear-gradient(135deg, var(--primary), var(--secondary));
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-        }
-
-        /* Decision Buttons */
-        .decision-container {
-            margin-top: 1.5rem;
-            padding: 1.5rem;
-            background: linear-gradient(135deg, rgba(99, 102, 241, 0.05), rgba(139, 92, 246, 0.05));
-            border-radius: 12px;
-            display: none;
-        }
-
-        .decision-container.show {
-            display: block;
-            animation: fadeIn 0.4s ease;
-        }
-
-        .decision-buttons {
-            display: flex;
-            gap: 0.75rem;
-            margin-top: 1rem;
-        }
-
-        .decision-buttons .btn {
-            flex: 1;
-        }
-
-        /* Loading Animation */
-        .loading {
-            display: inline-block;
-            width: 20px;
-            height: 20px;
-            border: 3px solid rgba(255, 255, 255, 0.3);
-            border-radius: 50%;
-            border-top-color: white;
-            animation: spin 1s ease-in-out infinite;
-            margin-left: 0.5rem;
-        }
-
-        @keyframes spin {
-            to { transform: rotate(360deg); }
-        }
-
-        /* Animations */
-        @keyframes fadeIn {
-            from { opacity: 0; }
-            to { opacity: 1; }
-        }
-
-        @keyframes fadeInDown {
-            from {
-                opacity: 0;
-                transform: translateY(-20px);
-            }
-            to {
-                opacity: 1;
-                transform: translateY(0);
-            }
-        }
-
-        @keyframes fadeInUp {
-            from {
-                opacity: 0;
-                transform: translateY(20px);
-            }
-            to {
-                opacity: 1;
-                transform: translateY(0);
-            }
-        }
-
-        /* Responsive */
-        @media (max-width: 768px) {
-            .header h1 {
-                font-size: 2.5rem;
-            }
-            
-            .main-grid {
-                grid-template-columns: 1fr;
-            }
-            
-            .decision-buttons {
-                flex-direction: column;
-            }
-        }
-
-        /* Custom Scrollbar */
-        ::-webkit-scrollbar {
-            width: 10px;
-            height: 10px;
-        }
-
-        ::-webkit-scrollbar-track {
-            background: var(--light);
-        }
-
-        ::-webkit-scrollbar-thumb {
-            background: linear-gradient(to bottom, var(--primary), var(--secondary));
-            border-radius: 5px;
-        }
-
-        ::-webkit-scrollbar-thumb:hover {
-            background: linear-gradient(to bottom, var(--primary-dark), var(--secondary));
-        }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('app.css') }}">
 </head>
 <body>
     <div class="container">
@@ -813,245 +244,7 @@ HTML_TEMPLATE = '''
         </div>
     </div>
 
-    <script>
-        const API_URL = window.location.origin;
-        let sessionId = 'session-' + Date.now();
-
-        async function startAnalysis() {
-            const btn = document.getElementById('startBtn');
-            const spinner = document.getElementById('loadingSpinner');
-            btn.disabled = true;
-            spinner.style.display = 'inline-block';
-            
-            const transaction = {
-                userName: document.getElementById('userName').value,
-                transactionAmount: parseFloat(document.getElementById('transactionAmount').value),
-                previousTransactions: parseInt(document.getElementById('previousTransactions').value),
-                accountAge: parseInt(document.getElementById('accountAge').value),
-                location: document.getElementById('location').value,
-                deviceType: document.getElementById('deviceType').value,
-                timeOfDay: document.getElementById('timeOfDay').value
-            };
-
-            // Reset UI
-            document.querySelectorAll('.agent-card').forEach(card => {
-                card.classList.remove('active', 'completed');
-                card.querySelector('.agent-output').classList.remove('show');
-                card.querySelector('.chat-interface').classList.remove('show');
-                card.querySelector('.agent-status').className = 'agent-status status-pending';
-                card.querySelector('.agent-status').textContent = 'Pending';
-            });
-            document.getElementById('finalDecision').classList.remove('show');
-
-            // Start analysis
-            setTimeout(async () => {
-                spinner.style.display = 'none';
-                await activateAgent('agent1', transaction);
-            }, 500);
-        }
-
-        async function activateAgent(agentId, transaction = null) {
-            const card = document.getElementById(agentId);
-            const status = document.getElementById(agentId + '-status');
-            
-            card.classList.add('active');
-            status.className = 'agent-status status-active';
-            status.textContent = 'Processing';
-
-            let endpoint = '';
-            if (agentId === 'agent1') endpoint = '/api/analyze/hound';
-            else if (agentId === 'agent2') endpoint = '/api/analyze/fetch';
-            else if (agentId === 'agent3') endpoint = '/api/analyze/judge';
-
-            try {
-                const response = await fetch(API_URL + endpoint, {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ sessionId, transaction })
-                });
-
-                const data = await response.json();
-                
-                setTimeout(() => {
-                    displayAgentOutput(agentId, data);
-                    status.className = 'agent-status status-completed';
-                    status.textContent = 'Complete';
-                    card.querySelector('.chat-interface').classList.add('show');
-                    
-                    if (agentId === 'agent3') {
-                        document.getElementById('finalDecision').classList.add('show');
-                    }
-                }, 800);
-            } catch (error) {
-                console.error('Error:', error);
-                status.textContent = 'Error';
-            }
-        }
-
-        function displayAgentOutput(agentId, data) {
-            const output = document.getElementById(agentId + '-output');
-            let html = '';
-
-            if (agentId === 'agent1') {
-                const riskLevel = data.fraudScore > 70 ? 'danger' : data.fraudScore > 40 ? 'warning' : 'success';
-                html = `
-                    <div class="metric-card">
-                        <div class="metric-label">Fraud Probability Score</div>
-                        <div class="metric-value">${data.fraudScore}%</div>
-                    </div>
-                    <div class="alert alert-${riskLevel}">
-                        <div>
-                            <strong>Confidence Level:</strong> ${data.confidence}%<br>
-                            <strong>Risk Factors Identified:</strong>
-                            <ul style="margin: 0.5rem 0 0 1.5rem;">
-                                ${data.factors.map(f => `<li>${f}</li>`).join('')}
-                            </ul>
-                        </div>
-                    </div>
-                `;
-            } else if (agentId === 'agent2') {
-                html = `
-                    <div class="metric-card">
-                        <div class="metric-label">Similar Patterns Found</div>
-                        <div class="metric-value">${data.similarCount}</div>
-                    </div>
-                    <div class="metric-card">
-                        <div class="metric-label">Historical Fraud Rate</div>
-                        <div class="metric-value">${data.fraudRate}%</div>
-                    </div>
-                    ${data.anomalies && data.anomalies.length > 0 ? `
-                        <div class="alert alert-danger">
-                            <div>
-                                <strong>⚠️ Critical Anomalies:</strong><br>
-                                ${data.anomalies.map(a => `• ${a}`).join('<br>')}
-                            </div>
-                        </div>
-                    ` : '<div class="alert alert-success">✓ Pattern within normal parameters</div>'}
-                `;
-            } else if (agentId === 'agent3') {
-                const alertType = data.finalScore > 70 ? 'danger' : data.finalScore > 50 ? 'warning' : 'success';
-                const icon = data.finalScore > 70 ? '🚨' : data.finalScore > 50 ? '⚠️' : '✅';
-                html = `
-                    <div class="alert alert-${alertType}">
-                        <div>
-                            <strong style="font-size: 1.25rem;">${icon} ${data.classification}</strong><br>
-                            <div style="margin-top: 0.75rem;">
-                                <strong>Risk Score:</strong> ${data.finalScore}%<br>
-                                <strong>Action:</strong> ${data.recommendation}
-                            </div>
-                        </div>
-                    </div>
-                `;
-            }
-
-            output.innerHTML = html;
-            output.classList.add('show');
-        }
-
-        async function sendMessage(agentId) {
-            const input = document.getElementById(agentId + '-input');
-            const message = input.value.trim();
-            if (!message) return;
-
-            const messagesDiv = document.getElementById(agentId + '-messages');
-            messagesDiv.innerHTML += `<div class="chat-message message-user"><strong>You:</strong> ${message}</div>`;
-            input.value = '';
-
-            try {
-                const response = await fetch(API_URL + '/api/chat/' + agentId, {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ sessionId, message })
-                });
-
-                const data = await response.json();
-                messagesDiv.innerHTML += `<div class="chat-message message-agent"><strong>Agent:</strong> ${data.response}</div>`;
-                messagesDiv.scrollTop = messagesDiv.scrollHeight;
-            } catch (error) {
-                messagesDiv.innerHTML += `<div class="chat-message message-agent"><strong>Agent:</strong> Processing your query...</div>`;
-            }
-        }
-
-        async function nextAgent(currentAgentId) {
-            const card = document.getElementById(currentAgentId);
-            card.classList.remove('active');
-            card.classList.add('completed');
-            
-            if (currentAgentId === 'agent1') {
-                await activateAgent('agent2');
-            } else if (currentAgentId === 'agent2') {
-                await activateAgent('agent3');
-            }
-        }
-
-        async function makeDecision(decision) {
-            await fetch(API_URL + '/api/decision', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ sessionId, decision })
-            });
-
-            const emoji = decision === 'approve' ? '✅' : decision === 'review' ? '🔍' : '🚫';
-            const color = decision === 'approve' ? '#10b981' : decision === 'review' ? '#f59e0b' : '#ef4444';
-            
-            // Modern notification
-            const notification = document.createElement('div');
-            notification.style.cssText = `
-                position: fixed;
-                top: 2rem;
-                right: 2rem;
-                background: white;
-                padding: 1.5rem 2rem;
-                border-radius: 12px;
-                box-shadow: 0 20px 25px -5px rgba(0, 0, 0, 0.1);
-                display: flex;
-                align-items: center;
-                gap: 1rem;
-                z-index: 1000;
-                animation: slideInRight 0.4s ease;
-                border-left: 4px solid ${color};
-            `;
-            notification.innerHTML = `
-                <span style="font-size: 2rem;">${emoji}</span>
-                <div>
-                    <strong style="font-size: 1.125rem;">Decision Recorded</strong><br>
-                    <span style="color: #64748b;">Transaction ${decision}</span>
-                </div>
-            `;
-            document.body.appendChild(notification);
-            
-            setTimeout(() => {
-                notification.style.animation = 'slideOutRight 0.4s ease';
-                setTimeout(() => notification.remove(), 400);
-            }, 3000);
-            
-            document.getElementById('startBtn').disabled = false;
-        }
-
-        // Keyboard support
-        document.querySelectorAll('.chat-input').forEach(input => {
-            input.addEventListener('keypress', (e) => {
-                if (e.key === 'Enter') {
-                    const agentId = input.id.replace('-input', '');
-                    sendMessage(agentId);
-                }
-            });
-        });
-
-        // Add slide animations
-        const style = document.createElement('style');
-        style.textContent = `
-            @keyframes slideInRight {
-                from { transform: translateX(100%); opacity: 0; }
-                to { transform: translateX(0); opacity: 1; }
-            }
-            @keyframes slideOutRight {
-                from { transform: translateX(0); opacity: 1; }
-                to { transform: translateX(100%); opacity: 0; }
-            }
-        `;
-        document.head.appendChild(style);
-    </script>
+    <script src="{{ asset_url('app.js') }}"></script>
 </body>
 </html>
 '''
@@ -1059,118 +252,179 @@ HTML_TEMPLATE = '''
 # [Keep all the Python backend code exactly the same as before]
 # ... rest of the Python code remains unchanged ...
 
-# Synthetic database generation
-def generate_synthetic_data():
-    data = []
-    for i in range(200):
-        is_fraud = random.random() > 0.8
-        data.append({
-            'transactionAmount': random.randint(10, 50000) if is_fraud else random.randint(10, 5000),
-            'previousTransactions': random.randint(1, 50) if is_fraud else random.randint(1, 500),
-            'accountAge': random.randint(1, 30) if is_fraud else random.randint(30, 1000),
-            'fraudScore': random.randint(0, 100),
-            'isFraud': is_fraud
-        })
-    return data
-
-synthetic_db = generate_synthetic_data()
+# Historical transactions Agent Fetch compares against, held as typed columns.
+# HISTORY_PATH points at a store file written by HistoricalStore.save; it is
+# opened with mmap so every worker shares one copy through the page cache.
+# Without it the history is synthetic, seeded so every worker and every run
+# sees the same SYNTHETIC_ROWS rows.
+HISTORY_PATH = os.environ.get('HISTORY_PATH')
+
+SYNTHETIC_ROWS = int(os.environ.get('SYNTHETIC_ROWS', 200))
+SYNTHETIC_SEED = int(os.environ.get('SYNTHETIC_SEED', 0))
+
+def load_base_store():
+    if HISTORY_PATH:
+        return HistoricalStore.open(HISTORY_PATH)
+    return synthetic_store(SYNTHETIC_ROWS, seed=SYNTHETIC_SEED)
+
+def history_source():
+    """What load_base_store() loads, as recorded in a shared snapshot's meta"""
+    if HISTORY_PATH:
+        return file_source(HISTORY_PATH)
+    return {'syntheticRows': SYNTHETIC_ROWS, 'syntheticSeed': SYNTHETIC_SEED}
+
+# HISTORY_SHM_NAME shares one copy of the store and its index between all
+# processes through shared memory. The first process to start (the gunicorn
+# master under preload) publishes it; `python shared_store.py publish` rolls
+# out a new snapshot, which workers switch to on their next request. Segments
+# outlive the processes, so a snapshot whose source is not this process's
+# HISTORY_PATH (or synthetic settings) is stale and gets republished.
+HISTORY_SHM_NAME = os.environ.get('HISTORY_SHM_NAME')
+shared_history = SharedStore(HISTORY_SHM_NAME) if HISTORY_SHM_NAME else None
+base_store = shared_history.current() if shared_history else None
+if base_store is not None and base_store.meta.get('source') != history_source():
+    base_store = None
+if base_store is None:
+    base_store = load_base_store()
+    if shared_history:
+        try:
+            publish(base_store, HISTORY_SHM_NAME, {'source': history_source()})
+        except FileExistsError:
+            pass  # another process published first
+        current = shared_history.current()
+        if current is not None and current.meta.get('source') == history_source():
+            base_store = current
+
+# How Fetch picks similar transactions: 'range' is the fraudScore / amount /
+# history threshold rule; 'knn' takes the FETCH_KNN_K nearest rows over
+# normalized features, dropping any farther than FETCH_KNN_MAX_DISTANCE
+FETCH_MODE = os.environ.get('FETCH_MODE', 'range')
+FETCH_KNN_K = int(os.environ.get('FETCH_KNN_K', 50))
+FETCH_KNN_MAX_DISTANCE = float(os.environ.get('FETCH_KNN_MAX_DISTANCE', 'inf'))
+if FETCH_MODE not in ('range', 'knn'):
+    raise ValueError(f"Unknown FETCH_MODE {FETCH_MODE!r}, expected 'knn' or 'range'")
+if FETCH_MODE == 'knn':
+    base_store.neighbors  # the KD-tree is built once at load
+
+# Approve/block decisions are labelled rows Fetch learns from. They collect in
+# a delta segment that is compacted into the base store in the background;
+# HISTORY_LOG_PATH shares the delta between workers and keeps it across restarts.
+# Without a log, a HISTORY_PATH or HISTORY_SHM_NAME base is never copied into a
+# worker to compact it; each worker keeps its latest HISTORY_COMPACT_ROWS or so.
+# With a log, one process compacts and publishes the new base: as the next
+# shared memory generation under HISTORY_SHM_NAME, otherwise as a store file
+# at HISTORY_COMPACT_PATH (default <log>.fdhs) that every worker maps.
+DECISION_LABELS = {'approve': False, 'block': True}
+HISTORY_LOG_PATH = os.environ.get('HISTORY_LOG_PATH') or None
+historical_store = LiveHistory(
+    base_store,
+    log_path=HISTORY_LOG_PATH,
+    compact_rows=int(os.environ.get('HISTORY_COMPACT_ROWS', 10000)),
+    compact_interval=float(os.environ.get('HISTORY_COMPACT_SECONDS', 60)),
+    shared=shared_history,
+    compact_path=os.environ.get('HISTORY_COMPACT_PATH') or (f'{HISTORY_LOG_PATH}.fdhs' if HISTORY_LOG_PATH else None),
+    source=history_source()
+)
+metrics.STORE_ROWS.set(len(historical_store))
 
 # [All the analyze functions remain the same]
+# Hound's scoring rules live in a JSON/YAML file and are reloaded when it changes.
+# hound_rules.velocity.json is the default set plus rules on the velocity features.
+HOUND_RULES_PATH = os.environ.get('HOUND_RULES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hound_rules.json'))
+hound_rules = RuleWatcher(HOUND_RULES_PATH)
+
+def device_key(transaction):
+    """deviceId when the client sends one; the form only has deviceType, so fall back to user + type"""
+    if transaction.get('deviceId') is not None:
+        return transaction['deviceId']
+    if transaction.get('userName') is not None and transaction.get('deviceType') is not None:
+        return f"{transaction['userName']}/{transaction['deviceType']}"
+    return None
+
+def record_velocity(transaction):
+    """Count a live transaction in the velocity windows and sketches; batch and offline rows are never recorded"""
+    user_name = transaction.get('userName')
+    velocity.observe(user_name, transaction.get('transactionAmount'))
+    velocity_sketches.observe(user_name, device_key(transaction), transaction.get('location'))
+
+VELOCITY_FEATURES = {name for names in velocity.feature_names for name in names}
+SKETCH_FEATURES = set(velocity_sketches.feature_names)
+
+def velocity_reads(rules):
+    """Whether rules read (window velocity, sketch) features; the default set reads neither"""
+    return not VELOCITY_FEATURES.isdisjoint(rules.numeric_fields), not SKETCH_FEATURES.isdisjoint(rules.numeric_fields)
+
+def with_velocity(transaction, rules):
+    """The transaction plus the velocity features (velocityCount1m, deviceCount1h, ...) rules read"""
+    windows, sketches = velocity_reads(rules)
+    if not (windows or sketches):
+        return transaction
+    user_name = transaction.get('userName')
+    features = velocity.features(user_name) if windows else {}
+    if sketches:
+        features.update(velocity_sketches.features(user_name, device_key(transaction), transaction.get('location')))
+    return {**transaction, **features} if features else transaction
+
+@timed('hound')
 def analyze_hound(transaction):
     """Agent Hound - ML Fraud Scoring"""
-    fraud_score = 30
-    factors = []
+    rules = hound_rules.current()
+    fraud_score, confidence, factors = rules.evaluate(with_velocity(transaction, rules))
     
-    if transaction['transactionAmount'] > 10000:
-        fraud_score += 20
-        factors.append('High transaction amount')
-    
-    if transaction['transactionAmount'] < 100 and transaction['previousTransactions'] > 100000:
-        fraud_score += 45
-        factors.append('ANOMALY: Tiny amount with massive transaction history')
-    elif transaction['previousTransactions'] > 10000:
-        fraud_score += 25
-        factors.append('Very high transaction frequency')
-    elif transaction['previousTransactions'] > 1000:
-        fraud_score += 15
-        factors.append('High transaction frequency')
-    
-    if transaction['accountAge'] < 30:
-        fraud_score += 15
-        factors.append('New account (<30 days)')
-    
-    if transaction.get('timeOfDay') == 'night':
-        fraud_score += 10
-        factors.append('Unusual time (night)')
-    
-    fraud_score = min(max(fraud_score, 0), 100)
-    confidence = min(90, 50 + len(factors) * 5)
-    
-    return {
-        'fraudScore': fraud_score,
-        'confidence': confidence,
-        'factors': factors,
-        'timestamp': datetime.now().isoformat()
-    }
+    return HoundResult.create(fraud_score, confidence, factors, time.time_ns())
+
+def similar_cluster(fraud_score, transaction):
+    """Cluster statistics over the historical rows FETCH_MODE treats as similar"""
+    if FETCH_MODE == 'knn':
+        return historical_store.nearest(fraud_score, transaction['transactionAmount'], transaction['previousTransactions'],
+                                        transaction['accountAge'], FETCH_KNN_K, FETCH_KNN_MAX_DISTANCE)
+    return historical_store.similar(fraud_score, transaction['transactionAmount'], transaction['previousTransactions'])
 
+@timed('fetch')
 def analyze_fetch(fraud_score, transaction):
     """Agent Fetch - Historical Pattern Analysis"""
-    similar = []
-    for t in synthetic_db:
-        score_similar = abs(t['fraudScore'] - fraud_score) < 20
-        amount_similar = abs(t['transactionAmount'] - transaction['transactionAmount']) < transaction['transactionAmount'] * 0.5 if transaction['transactionAmount'] > 0 else False
-        prev_trans_similar = abs(t['previousTransactions'] - transaction['previousTransactions']) < transaction['previousTransactions'] * 0.5 if transaction['previousTransactions'] > 0 else False
-        
-        if score_similar or (amount_similar and prev_trans_similar):
-            similar.append(t)
-    
-    anomalies = []
-    avg_amount = 0
-    avg_prev = 0
-    avg_age = 0
-    
-    if similar:
-        avg_amount = sum(t['transactionAmount'] for t in similar) / len(similar)
-        avg_prev = sum(t['previousTransactions'] for t in similar) / len(similar)
-        avg_age = sum(t['accountAge'] for t in similar) / len(similar)
+    cluster = similar_cluster(fraud_score, transaction)
+    amount = transaction['transactionAmount']
+    prev = transaction['previousTransactions']
+    age = transaction['accountAge']
+    
+    flags = 0
+    avg_amount = avg_prev = avg_age = None
+    
+    if cluster['count']:
+        avg_amount = cluster['avgAmount']
+        avg_prev = cluster['avgPrev']
+        avg_age = cluster['avgAge']
         
-        if abs(transaction['transactionAmount'] - avg_amount) > avg_amount * 2:
-            anomalies.append(f'Transaction Amount (${transaction["transactionAmount"]} vs cluster avg ${avg_amount:.2f})')
+        if abs(amount - avg_amount) > avg_amount * 2:
+            flags |= AMOUNT_ANOMALY
         
-        if abs(transaction['previousTransactions'] - avg_prev) > avg_prev * 2:
-            anomalies.append(f'Previous Transactions ({transaction["previousTransactions"]:,} vs cluster avg {avg_prev:.0f})')
+        if abs(prev - avg_prev) > avg_prev * 2:
+            flags |= PREV_ANOMALY
         
-        if abs(transaction['accountAge'] - avg_age) > avg_age * 2:
-            anomalies.append(f'Account Age ({transaction["accountAge"]} days vs cluster avg {avg_age:.0f} days)')
+        if abs(age - avg_age) > avg_age * 2:
+            flags |= AGE_ANOMALY
         
-        if transaction['transactionAmount'] < 100 and transaction['previousTransactions'] > 100000:
-            pattern_found = any(
-                t['transactionAmount'] < 100 and t['previousTransactions'] > 100000 
-                for t in similar
-            )
-            if not pattern_found:
-                anomalies.append('CRITICAL: No legitimate user shows this tiny amount + massive history pattern')
+        if amount < 100 and prev > 100000:
+            if not cluster['patternFound']:
+                flags |= PATTERN_ANOMALY
     
-    fraud_count = sum(1 for t in similar if t['isFraud'])
-    fraud_rate = (fraud_count / len(similar) * 100) if similar else 0
+    fraud_rate = (cluster['fraudCount'] / cluster['count'] * 100) if cluster['count'] else 0
     
-    return {
-        'similarCount': len(similar),
-        'fraudRate': round(fraud_rate),
-        'anomalies': anomalies,
-        'timestamp': datetime.now().isoformat()
-    }
+    return FetchResult(cluster['count'], round(fraud_rate), flags, amount, prev, age,
+                       avg_amount, avg_prev, avg_age, time.time_ns())
 
+@timed('judge')
 def analyze_judge(hound_data, fetch_data, transaction):
     """Agent Judge - Final Classification"""
-    final_score = hound_data['fraudScore']
+    final_score = hound_data.fraud_score
     
-    if fetch_data['fraudRate'] > 60:
+    if fetch_data.fraud_rate > 60:
         final_score += 15
-    elif fetch_data['fraudRate'] < 20:
+    elif fetch_data.fraud_rate < 20:
         final_score -= 10
     
-    final_score += len(fetch_data['anomalies']) * 10
+    final_score += fetch_data.anomaly_count * 10
     
     if transaction['transactionAmount'] < 100 and transaction['previousTransactions'] > 100000:
         final_score = max(final_score, 85)
@@ -1178,65 +432,520 @@ def analyze_judge(hound_data, fetch_data, transaction):
     final_score = min(max(final_score, 0), 100)
     
     if final_score >= 70:
-        classification = 'HIGH RISK - FRAUD DETECTED'
-        recommendation = f'Block transaction immediately. ${transaction["transactionAmount"]} with {transaction["previousTransactions"]:,} previous transactions is extremely suspicious.'
+        tier = HIGH_RISK
     elif final_score >= 50:
-        classification = 'SUSPICIOUS ACTIVITY'
-        recommendation = 'Flag for manual review. Unusual pattern detected.'
+        tier = SUSPICIOUS
+    else:
+        tier = LEGITIMATE
+    
+    return JudgeResult(final_score, tier, transaction['transactionAmount'], transaction['previousTransactions'],
+                       time.time_ns())
+
+# Vectorized batch scoring - mirrors analyze_hound / analyze_fetch / analyze_judge
+# rule for rule, but evaluates each rule once over the whole batch. Fetch asks
+# the historical store's index once per distinct row instead.
+
+# Every agent reads these; the single path fails on a row without them, so the
+# batch path rejects such rows up front instead of scoring NaN or a string
+REQUIRED_NUMBERS = ('transactionAmount', 'previousTransactions', 'accountAge')
+
+def transaction_error(transaction):
+    """Why a batch row cannot be scored, or None if it can"""
+    if not isinstance(transaction, dict):
+        return 'is not an object'
+    for field in REQUIRED_NUMBERS:
+        value = transaction.get(field)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return f'{field} must be a number, got {json.dumps(value)}'
+    return None
+
+def transaction_columns(transactions, rules):
+    """Turn a list of transaction dicts into typed NumPy columns for Fetch/Judge and the Hound rules"""
+    cols = rules.columns(transactions)
+    cols.update({
+        'transactionAmount': np.array([t['transactionAmount'] for t in transactions], dtype=np.float64),
+        'previousTransactions': np.array([t['previousTransactions'] for t in transactions], dtype=np.float64),
+        'accountAge': np.array([t['accountAge'] for t in transactions], dtype=np.float64),
+    })
+    return cols
+
+@timed('hound_batch')
+def analyze_hound_batch(cols, rules):
+    """Agent Hound over a batch - returns fraudScore, confidence and a factor bitmask per row"""
+    return rules.evaluate_batch(cols, len(cols['transactionAmount']))
+
+@timed('fetch_batch')
+def analyze_fetch_batch(fraud_score, cols):
+    """Agent Fetch over a batch - similarity counts, fraud rates and anomaly flags per row"""
+    n = len(fraud_score)
+    amount = cols['transactionAmount']
+    prev = cols['previousTransactions']
+    
+    similar_count = np.zeros(n, dtype=np.int64)
+    fraud_count = np.zeros(n, dtype=np.int64)
+    sums = np.zeros((n, 3), dtype=np.float64)
+    pattern_count = np.zeros(n, dtype=np.int64)
+    
+    if FETCH_MODE == 'knn':
+        # Neighbour sets differ per row, so each row is one tree query
+        for i in range(n):
+            count, amount_sum, prev_sum, age_sum, fraud, pattern = historical_store.nearest_totals(
+                fraud_score[i], amount[i], prev[i], cols['accountAge'][i], FETCH_KNN_K, FETCH_KNN_MAX_DISTANCE)
+            similar_count[i], fraud_count[i], pattern_count[i] = count, fraud, pattern
+            sums[i] = (amount_sum, prev_sum, age_sum)
     else:
-        classification = 'LEGITIMATE TRANSACTION'
-        recommendation = 'Approve transaction'
+        # Comparing every row with the whole store costs batch x store cells; the
+        # index answers a row from its fraudScore window, grid cells and prefix
+        # sums. Rows asking the same question share one answer.
+        answers = {}
+        for i, key in enumerate(zip(fraud_score.tolist(), amount.tolist(), prev.tolist())):
+            totals = answers.get(key)
+            if totals is None:
+                totals = answers[key] = historical_store.similar_totals(*key)
+            count, amount_sum, prev_sum, age_sum, fraud, pattern = totals
+            similar_count[i], fraud_count[i], pattern_count[i] = count, fraud, pattern
+            sums[i] = (amount_sum, prev_sum, age_sum)
+    
+    has_similar = similar_count > 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avgs = np.where(has_similar[:, None], sums / similar_count[:, None], 0.0)
+        fraud_rate = np.where(has_similar, fraud_count / similar_count * 100, 0.0)
+    
+    values = np.stack([amount, prev, cols['accountAge']], axis=1)
+    outliers = has_similar[:, None] & (np.abs(values - avgs) > avgs * 2)
+    tiny_massive = (amount < 100) & (prev > 100000)
+    missing_pattern = has_similar & tiny_massive & (pattern_count == 0)
     
     return {
-        'classification': classification,
-        'finalScore': final_score,
-        'recommendation': recommendation,
-        'timestamp': datetime.now().isoformat()
+        'similarCount': similar_count,
+        'fraudRate': np.round(fraud_rate).astype(np.int64),
+        'averages': avgs,
+        'outliers': outliers,
+        'missingPattern': missing_pattern,
+        'anomalyCount': outliers.sum(axis=1) + missing_pattern,
     }
 
-def get_llm_response(agent_name, message, context):
-    """Get response from OpenAI with full context"""
+@timed('judge_batch')
+def analyze_judge_batch(hound, fetch, cols):
+    """Agent Judge over a batch - final score and verdict tier per row (2 high, 1 suspicious, 0 legit)"""
+    final_score = hound['fraudScore'].copy()
+    final_score += np.where(fetch['fraudRate'] > 60, 15, np.where(fetch['fraudRate'] < 20, -10, 0))
+    final_score += fetch['anomalyCount'] * 10
+    
+    tiny_massive = (cols['transactionAmount'] < 100) & (cols['previousTransactions'] > 100000)
+    final_score = np.where(tiny_massive, np.maximum(final_score, 85), final_score)
+    final_score = np.clip(final_score, 0, 100)
+    
+    tier = np.where(final_score >= 70, 2, np.where(final_score >= 50, 1, 0))
+    return {'finalScore': final_score, 'tier': tier}
+
+def render_batch_row(transaction, hound, fetch, judge, i, timestamp):
+    """Render row i of the batch outputs in the same shape as run_pipeline"""
+    bits = int(hound['factorBits'][i])
+    avg_amount, avg_prev, avg_age = fetch['averages'][i]
+    outliers = fetch['outliers'][i]
+    
+    flags = (outliers[0] * AMOUNT_ANOMALY | outliers[1] * PREV_ANOMALY | outliers[2] * AGE_ANOMALY
+             | fetch['missingPattern'][i] * PATTERN_ANOMALY)
+    amount = transaction['transactionAmount']
+    prev = transaction['previousTransactions']
+    tier = int(judge['tier'][i])
+    
+    return {
+        'hound': {
+            'fraudScore': int(hound['fraudScore'][i]),
+            'confidence': int(hound['confidence'][i]),
+            'factors': [f for bit, f in enumerate(hound['factorNames']) if bits >> bit & 1],
+            'timestamp': timestamp
+        },
+        'fetch': {
+            'similarCount': int(fetch['similarCount'][i]),
+            'fraudRate': int(fetch['fraudRate'][i]),
+            'anomalies': anomaly_messages(flags, amount, prev, transaction['accountAge'], avg_amount, avg_prev, avg_age),
+            'timestamp': timestamp
+        },
+        'judge': {
+            'classification': CLASSIFICATIONS[tier],
+            'finalScore': int(judge['finalScore'][i]),
+            'recommendation': recommendation(tier, amount, prev),
+            'timestamp': timestamp
+        }
+    }
+
+def run_pipeline_batch(transactions):
+    """Run Hound -> Fetch -> Judge over a list of transactions, results in input order"""
+    rules = hound_rules.current()
+    rows = [with_velocity(t, rules) for t in transactions] if any(velocity_reads(rules)) else transactions
+    cols = transaction_columns(rows, rules)
+    hound = analyze_hound_batch(cols, rules)
+    fetch = analyze_fetch_batch(hound['fraudScore'], cols)
+    judge = analyze_judge_batch(hound, fetch, cols)
+    
+    timestamp = datetime.now().isoformat()
+    return [render_batch_row(t, hound, fetch, judge, i, timestamp) for i, t in enumerate(transactions)]
+
+def template_response(agent_name, message, context):
+    """Canned agent reply used when the LLM is unavailable, overloaded or too slow"""
     transaction = context.get('transaction', {})
     
-    if not openai.api_key or openai.api_key == '':
-        if 'amount' in message.lower():
-            return f"The transaction amount is ${transaction.get('transactionAmount', 40)}. With {transaction.get('previousTransactions', 3000000):,} previous transactions in 24 hours, this is highly suspicious."
-        
-        if 'context' in message.lower() or 'information' in message.lower():
-            return f"I'm analyzing a ${transaction.get('transactionAmount', 40)} transaction from {transaction.get('userName', 'the user')} with {transaction.get('previousTransactions', 3000000):,} previous transactions. The fraud score is {context.get('fraudScore', 75)}% with key risk factors identified."
-        
-        return f"This transaction shows highly unusual patterns. ${transaction.get('transactionAmount', 40)} with {transaction.get('previousTransactions', 3000000):,} previous transactions is a major red flag."
+    if 'amount' in message.lower():
+        return f"The transaction amount is ${transaction.get('transactionAmount', 40)}. With {transaction.get('previousTransactions', 3000000):,} previous transactions in 24 hours, this is highly suspicious."
     
+    if 'context' in message.lower() or 'information' in message.lower():
+        return f"I'm analyzing a ${transaction.get('transactionAmount', 40)} transaction from {transaction.get('userName', 'the user')} with {transaction.get('previousTransactions', 3000000):,} previous transactions. The fraud score is {context.get('fraudScore', 75)}% with key risk factors identified."
+    
+    return f"This transaction shows highly unusual patterns. ${transaction.get('transactionAmount', 40)} with {transaction.get('previousTransactions', 3000000):,} previous transactions is a major red flag."
+
+def unavailable_response(context):
+    """Short reply used when the LLM call fails outright"""
+    transaction = context.get('transaction', {})
+    return f"The transaction is ${transaction.get('transactionAmount', 40)} with {transaction.get('previousTransactions', 3000000):,} previous transactions."
+
+def llm_messages(agent_name, message, context):
+    transaction = context.get('transaction', {})
+    
+    system_prompts = {
+        'agent1': "You are Agent Hound, a fraud detection ML specialist.",
+        'agent2': "You are Agent Fetch, analyzing historical patterns.",
+        'agent3': "You are Agent Judge, making final fraud decisions."
+    }
+    
+    context_message = f"""
+    Transaction: ${transaction.get('transactionAmount')} with {transaction.get('previousTransactions'):,} previous transactions
+    Fraud Score: {context.get('fraudScore')}%
+    User Question: {message}
+    """
+    
+    return [
+        {"role": "system", "content": system_prompts.get(agent_name, "You are a fraud detection agent.")},
+        {"role": "user", "content": context_message}
+    ]
+
+def complete_llm(agent_name, message, context, stream=False):
+    """Blocking OpenAI call - only ever run on llm_executor.
+
+    A streamed call returns as soon as the stream opens; its caller times
+    the whole stream into LLM_SECONDS instead.
+    """
+    if stream:
+        return create_completion(agent_name, message, context, stream=True)
+    with metrics.LLM_SECONDS.time():
+        response = create_completion(agent_name, message, context)
+    return response.choices[0].message.content
+
+def create_completion(agent_name, message, context, stream=False):
+    return openai_module().ChatCompletion.create(
+        model="gpt-3.5-turbo",
+        messages=llm_messages(agent_name, message, context),
+        max_tokens=150,
+        temperature=0.7,
+        request_timeout=LLM_DEADLINE_SECONDS,
+        stream=stream
+    )
+
+def get_llm_response(agent_name, message, context):
+    """Get response from OpenAI with full context, within LLM_DEADLINE_SECONDS"""
+    if not OPENAI_API_KEY:
+        metrics.LLM_FALLBACKS.labels('no_key').inc()
+        return template_response(agent_name, message, context)
+    
+    key = cache_key(agent_name, message, context)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        metrics.LLM_CACHE_HITS.inc()
+        return cached
+    
+    # Shed load instead of queueing behind a slow upstream
+    if not llm_slots.acquire(blocking=False):
+        metrics.LLM_FALLBACKS.labels('overloaded').inc()
+        return template_response(agent_name, message, context)
     try:
-        system_prompts = {
-            'agent1': "You are Agent Hound, a fraud detection ML specialist.",
-            'agent2': "You are Agent Fetch, analyzing historical patterns.",
-            'agent3': "You are Agent Judge, making final fraud decisions."
-        }
-        
-        context_message = f"""
-        Transaction: ${transaction.get('transactionAmount')} with {transaction.get('previousTransactions'):,} previous transactions
-        Fraud Score: {context.get('fraudScore')}%
-        User Question: {message}
-        """
-        
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompts.get(agent_name, "You are a fraud detection agent.")},
-                {"role": "user", "content": context_message}
-            ],
-            max_tokens=150,
-            temperature=0.7
-        )
-        return response.choices[0].message.content
-    except:
-        return f"The transaction is ${transaction.get('transactionAmount', 40)} with {transaction.get('previousTransactions', 3000000):,} previous transactions."
+        future = llm_executor.submit(complete_llm, agent_name, message, context)
+    except RuntimeError:
+        llm_slots.release()
+        metrics.LLM_FALLBACKS.labels('overloaded').inc()
+        return template_response(agent_name, message, context)
+    
+    def finished(f):
+        llm_slots.release()
+        # Cache late answers too, so a retry after a deadline miss is instant
+        if not f.cancelled() and f.exception() is None:
+            llm_cache.put(key, f.result())
+    future.add_done_callback(finished)
+    
+    try:
+        return future.result(timeout=LLM_DEADLINE_SECONDS)
+    except FuturesTimeoutError:
+        # The call keeps its pool slot until the request_timeout fires upstream
+        metrics.LLM_FALLBACKS.labels('deadline').inc()
+        return template_response(agent_name, message, context)
+    except Exception:
+        metrics.LLM_FALLBACKS.labels('error').inc()
+        return unavailable_response(context)
+
+def split_tokens(text):
+    """Break a finished reply into word tokens so it streams like a live one"""
+    return re.findall(r'\S+\s*', text)
+
+def stream_llm_response(agent_name, message, context):
+    """Yield the agent's reply token by token.
+    
+    Same fallbacks as get_llm_response. LLM_DEADLINE_SECONDS bounds the wait
+    for each token, so time to first token is capped rather than total time.
+    """
+    if not OPENAI_API_KEY:
+        metrics.LLM_FALLBACKS.labels('no_key').inc()
+        yield from split_tokens(template_response(agent_name, message, context))
+        return
+    
+    key = cache_key(agent_name, message, context)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        metrics.LLM_CACHE_HITS.inc()
+        yield from split_tokens(cached)
+        return
+    
+    if not llm_slots.acquire(blocking=False):
+        metrics.LLM_FALLBACKS.labels('overloaded').inc()
+        yield from split_tokens(template_response(agent_name, message, context))
+        return
+    
+    tokens = queue.Queue()
+    
+    def produce():
+        try:
+            with metrics.LLM_SECONDS.time():
+                for chunk in complete_llm(agent_name, message, context, stream=True):
+                    delta = chunk.choices[0].delta.get('content')
+                    if delta:
+                        tokens.put(delta)
+            tokens.put(None)
+        except Exception as e:
+            tokens.put(e)
+        finally:
+            llm_slots.release()
+    
+    try:
+        llm_executor.submit(produce)
+    except RuntimeError:
+        llm_slots.release()
+        metrics.LLM_FALLBACKS.labels('overloaded').inc()
+        yield from split_tokens(template_response(agent_name, message, context))
+        return
+    
+    parts = []
+    while True:
+        try:
+            item = tokens.get(timeout=LLM_DEADLINE_SECONDS)
+        except queue.Empty:
+            metrics.LLM_FALLBACKS.labels('deadline').inc()
+            if not parts:
+                yield from split_tokens(template_response(agent_name, message, context))
+            return
+        if item is None:
+            break
+        if isinstance(item, Exception):
+            metrics.LLM_FALLBACKS.labels('error').inc()
+            if not parts:
+                yield from split_tokens(unavailable_response(context))
+            return
+        parts.append(item)
+        yield item
+    
+    llm_cache.put(key, ''.join(parts))
+
+def sse_event(event, payload):
+    return f'event: {event}\ndata: {json.dumps(payload)}\n\n'
+
+def run_pipeline(transaction):
+    """Run Hound -> Fetch -> Judge in-process for a single transaction"""
+    hound = analyze_hound(transaction)
+    fetch = analyze_fetch(hound.fraud_score, transaction)
+    judge = analyze_judge(hound, fetch, transaction)
+    return {'hound': hound, 'fetch': fetch, 'judge': judge}
+
+def render_pipeline(result):
+    """run_pipeline's records in the API's JSON shape"""
+    return {agent: record.to_dict() for agent, record in result.items()}
 
 # [All Flask routes remain exactly the same]
+def precompress(body):
+    """Encoded variants of a static body, each as (bytes, strong ETag)"""
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    variants = {
+        'identity': (body, digest),
+        'gzip': (gzip.compress(body, compresslevel=9, mtime=0), digest + '-gz')
+    }
+    if brotli is not None:
+        variants['br'] = (brotli.compress(body, quality=11), digest + '-br')
+    return variants
+
+def send_precompressed(variants, mimetype, cache_control='no-cache'):
+    """Serve the best encoding the client accepts, or 304 if its ETag matches"""
+    encoding = request.accept_encodings.best_match([e for e in ('br', 'gzip') if e in variants]) or 'identity'
+    body, etag = variants[encoding]
+    
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype=mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+# CSS and JS live in static/ and are served under content-hashed names, so
+# browsers and CDNs can cache them forever. ASSET_BASE_URL points the page at
+# a CDN holding the output of `flask --app app export-assets`.
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+ASSET_BASE_URL = os.environ.get('ASSET_BASE_URL', '/assets').rstrip('/')
+ASSET_TYPES = {'.css': 'text/css', '.js': 'text/javascript'}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+def load_assets():
+    """Fingerprint and precompress the assets in static/"""
+    assets, urls = {}, {}
+    for name in sorted(os.listdir(ASSET_DIR)):
+        stem, ext = os.path.splitext(name)
+        if ext not in ASSET_TYPES:
+            continue
+        with open(os.path.join(ASSET_DIR, name), 'rb') as f:
+            body = f.read()
+        hashed_name = f'{stem}.{hashlib.sha256(body).hexdigest()[:12]}{ext}'
+        assets[hashed_name] = (precompress(body), ASSET_TYPES[ext])
+        urls[name] = f'{ASSET_BASE_URL}/{hashed_name}'
+    return assets, urls
+
+ASSETS, ASSET_URLS = load_assets()
+
+# The page has no per-request state, so render it once and keep it precompressed
+with app.app_context():
+    INDEX_PAGE = precompress(render_template_string(HTML_TEMPLATE, asset_url=ASSET_URLS.__getitem__).encode('utf-8'))
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    # Unhandled exceptions reach here as 500s, so they are counted as errors too
+    route = request.endpoint or 'unmatched'
+    metrics.REQUEST_SECONDS.labels(route).observe(time.perf_counter() - g.request_started)
+    metrics.REQUESTS.labels(route, str(response.status_code)).inc()
+    if response.status_code >= 500:
+        metrics.REQUEST_ERRORS.labels(route).inc()
+    if SESSION_BACKEND == 'memory':
+        metrics.SESSIONS.set(len(sessions))
+    return response
+
+@app.route('/metrics')
+def api_metrics():
+    metrics.SESSIONS.set(len(sessions))
+    metrics.STORE_ROWS.set(len(historical_store))
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
+@app.route('/assets/<name>')
+def asset(name):
+    if name not in ASSETS:
+        return jsonify({'error': 'Not found'}), 404
+    variants, mimetype = ASSETS[name]
+    return send_precompressed(variants, mimetype, cache_control=IMMUTABLE)
+
+@app.cli.command('export-assets')
+@click.argument('out_dir')
+def export_assets(out_dir):
+    """Write the fingerprinted assets, with .gz/.br siblings, for a CDN"""
+    os.makedirs(out_dir, exist_ok=True)
+    suffixes = {'identity': '', 'gzip': '.gz', 'br': '.br'}
+    for name, (variants, _) in ASSETS.items():
+        for encoding, (body, _) in variants.items():
+            with open(os.path.join(out_dir, name + suffixes[encoding]), 'wb') as f:
+                f.write(body)
+        click.echo(name)
+
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    return send_precompressed(INDEX_PAGE, 'text/html')
+
+@app.route('/api/analyze', methods=['POST'])
+def api_analyze():
+    data = request.json
+    session_id = data.get('sessionId')
+    transaction = data.get('transaction')
+    
+    record_velocity(transaction)
+    result = run_pipeline(transaction)
+    
+    # Keep the per-agent session keys populated so /api/chat keeps working
+    if session_id and data.get('storeSession', True):
+        sessions.update(session_id, {'transaction': transaction, **result})
+    
+    return jsonify(render_pipeline(result))
+
+@app.route('/api/analyze/batch', methods=['POST'])
+def api_batch():
+    started = time.perf_counter()
+    
+    # JSON array, {"transactions": [...]}, or NDJSON (one transaction per line)
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        try:
+            transactions = [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        except ValueError as e:
+            return jsonify({'error': f'Invalid NDJSON: {e}'}), 400
+    else:
+        data = request.get_json(silent=True)
+        transactions = data.get('transactions') if isinstance(data, dict) else data
+    
+    if not isinstance(transactions, list):
+        return jsonify({'error': 'Expected a JSON array of transactions or an NDJSON body'}), 400
+    for i, transaction in enumerate(transactions):
+        error = transaction_error(transaction)
+        if error:
+            return jsonify({'error': f'Invalid transaction in batch: row {i} {error}'}), 400
+    
+    try:
+        results = run_pipeline_batch(transactions)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid transaction in batch: {e}'}), 400
+    
+    elapsed = time.perf_counter() - started
+    return jsonify({
+        'results': results,
+        'meta': {
+            'count': len(results),
+            'elapsedMs': round(elapsed * 1000, 3),
+            'rowsPerSecond': round(len(results) / elapsed) if elapsed > 0 else None
+        }
+    })
+
+@app.route('/api/store/stats')
+def api_store_stats():
+    return jsonify(historical_store.stats())
+
+@app.route('/api/sessions/stats')
+def api_session_stats():
+    return jsonify(sessions.stats())
+
+@app.route('/api/velocity/stats')
+def api_velocity_stats():
+    return jsonify({**velocity.stats(), 'sketches': velocity_sketches.stats()})
+
+@app.route('/api/llm/stats')
+def api_llm_stats():
+    return jsonify({'cache': llm_cache.stats()})
+
+@app.route('/api/rules')
+def api_rules():
+    return jsonify(hound_rules.stats())
+
+@app.route('/api/rules/reload', methods=['POST'])
+def api_rules_reload():
+    if not hound_rules.reload():
+        return jsonify({'error': hound_rules.last_error, **hound_rules.stats()}), 400
+    return jsonify(hound_rules.stats())
 
 @app.route('/api/analyze/hound', methods=['POST'])
 def api_hound():
@@ -1244,47 +953,47 @@ def api_hound():
     session_id = data.get('sessionId')
     transaction = data.get('transaction')
     
+    record_velocity(transaction)
     result = analyze_hound(transaction)
     
-    if session_id not in sessions:
-        sessions[session_id] = {}
-    sessions[session_id]['hound'] = result
-    sessions[session_id]['transaction'] = transaction
+    sessions.update(session_id, {'hound': result, 'transaction': transaction})
     
-    return jsonify(result)
+    return jsonify(result.to_dict())
 
 @app.route('/api/analyze/fetch', methods=['POST'])
 def api_fetch():
     data = request.json
     session_id = data.get('sessionId')
     
-    if session_id not in sessions:
+    session_data = sessions.get(session_id)
+    if session_data is None:
         return jsonify({'error': 'No session found'}), 400
     
-    hound_data = sessions[session_id].get('hound')
-    transaction = sessions[session_id].get('transaction')
+    hound_data = session_data.get('hound')
+    transaction = session_data.get('transaction')
     
-    result = analyze_fetch(hound_data['fraudScore'], transaction)
-    sessions[session_id]['fetch'] = result
+    result = analyze_fetch(hound_data.fraud_score, transaction.to_dict())
+    sessions.update(session_id, {'fetch': result})
     
-    return jsonify(result)
+    return jsonify(result.to_dict())
 
 @app.route('/api/analyze/judge', methods=['POST'])
 def api_judge():
     data = request.json
     session_id = data.get('sessionId')
     
-    if session_id not in sessions:
+    session_data = sessions.get(session_id)
+    if session_data is None:
         return jsonify({'error': 'No session found'}), 400
     
-    hound_data = sessions[session_id].get('hound')
-    fetch_data = sessions[session_id].get('fetch')
-    transaction = sessions[session_id].get('transaction')
+    hound_data = session_data.get('hound')
+    fetch_data = session_data.get('fetch')
+    transaction = session_data.get('transaction')
     
-    result = analyze_judge(hound_data, fetch_data, transaction)
-    sessions[session_id]['judge'] = result
+    result = analyze_judge(hound_data, fetch_data, transaction.to_dict())
+    sessions.update(session_id, {'judge': result})
     
-    return jsonify(result)
+    return jsonify(result.to_dict())
 
 @app.route('/api/chat/<agent_name>', methods=['POST'])
 def api_chat(agent_name):
@@ -1292,10 +1001,10 @@ def api_chat(agent_name):
     session_id = data.get('sessionId')
     message = data.get('message')
     
-    if session_id not in sessions:
+    session_data = sessions.get(session_id)
+    if session_data is None:
         return jsonify({'error': 'No session found'}), 400
-    
-    session_data = sessions[session_id]
+    session_data = session_data.to_dict()
     
     context = {
         'transaction': session_data.get('transaction', {}),
@@ -1309,6 +1018,18 @@ def api_chat(agent_name):
         'recommendation': session_data.get('judge', {}).get('recommendation')
     }
     
+    # Stream tokens as server-sent events when the client asks for them
+    if data.get('stream') or request.accept_mimetypes.best == 'text/event-stream':
+        def events():
+            parts = []
+            for token in stream_llm_response(agent_name, message, context):
+                parts.append(token)
+                yield sse_event('token', {'token': token})
+            yield sse_event('done', {'response': ''.join(parts)})
+        
+        return Response(events(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
     response = get_llm_response(agent_name, message, context)
     
     return jsonify({'response': response})
@@ -1319,10 +1040,19 @@ def api_decision():
     session_id = data.get('sessionId')
     decision = data.get('decision')
     
-    if session_id in sessions:
-        sessions[session_id]['decision'] = decision
+    learned = False
+    session_data = sessions.get(session_id)
+    if session_data is not None:
+        transaction = session_data.get('transaction')
+        hound = session_data.get('hound')
+        # A session is learned from once; a later change of mind only updates the session
+        if decision in DECISION_LABELS and transaction and hound and not session_data.get('learned'):
+            historical_store.append(transaction.amount, transaction.previous_transactions,
+                                    transaction.account_age, hound.fraud_score, DECISION_LABELS[decision])
+            learned = True
+        sessions.update(session_id, {'decision': decision, 'learned': learned or session_data.get('learned', False)})
     
-    return jsonify({'status': 'success', 'decision': decision})
+    return jsonify({'status': 'success', 'decision': decision, 'learned': learned})
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
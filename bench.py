@@ -0,0 +1,291 @@
+# bench.py - Reproducible benchmarks for the scoring engines and HTTP endpoints
+#
+#   python bench.py engines --sizes 200,100000,1000000 --out engines.json
+#   python bench.py http --out http.json
+#   python bench.py gunicorn --workers 2 --out gunicorn.json
+#   python bench.py compare before.json after.json
+import argparse
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.request
+
+import numpy as np
+
+import app
+from synthetic import synthetic_store
+
+DEFAULT_SIZES = (200, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def sample_transactions(n, seed=1):
+    """Seeded mix of ordinary, high-value and tiny-amount/massive-history transactions"""
+    rng = np.random.default_rng(seed)
+    transactions = []
+    for i in range(n):
+        kind = i % 4
+        transactions.append({
+            'userName': f'user{i}',
+            'transactionAmount': 40 if kind == 3 else int(rng.integers(10, 5000 if kind < 2 else 50000)),
+            'previousTransactions': 3000000 if kind == 3 else int(rng.integers(1, 5000)),
+            'accountAge': int(rng.integers(1, 1000)),
+            'location': 'US',
+            'deviceType': 'mobile',
+            'timeOfDay': 'night' if kind == 2 else 'day',
+        })
+    return transactions
+
+
+def summarize(name, latencies, elapsed, ops=None, **extra):
+    """p50/p95/p99 and throughput for a list of per-call latencies in seconds"""
+    ms = np.asarray(latencies) * 1000
+    result = {
+        'name': name,
+        'calls': len(ms),
+        'meanMs': round(float(ms.mean()), 4),
+        'p50Ms': round(float(np.percentile(ms, 50)), 4),
+        'p95Ms': round(float(np.percentile(ms, 95)), 4),
+        'p99Ms': round(float(np.percentile(ms, 99)), 4),
+        'opsPerSec': round((ops if ops is not None else len(ms)) / elapsed, 1) if elapsed > 0 else None,
+    }
+    result.update(extra)
+    return result
+
+
+def measure(fn, args_list, repeat=1, warmup=5):
+    """Time fn(*args) over args_list; returns latencies, elapsed and peak traced memory"""
+    for args in args_list[:warmup]:
+        fn(*args)
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for args in args_list:
+            t0 = time.perf_counter()
+            fn(*args)
+            latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    # Memory is traced in a separate pass so tracing overhead stays out of the timings
+    tracemalloc.start()
+    for args in args_list[:20]:
+        fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return latencies, elapsed, peak
+
+
+def bench_engines(sizes, calls, batch_size):
+    results = []
+    transactions = sample_transactions(calls)
+    hounds = [app.analyze_hound(t) for t in transactions]
+    original = app.historical_store
+    try:
+        for size in sizes:
+            started = time.perf_counter()
+            app.historical_store = synthetic_store(size)
+            app.historical_store.index
+            build_ms = round((time.perf_counter() - started) * 1000, 1)
+            fetches = [app.analyze_fetch(h.fraud_score, t) for h, t in zip(hounds, transactions)]
+            extra = {'storeRows': size, 'storeBuildMs': build_ms}
+
+            for name, fn, args_list in (
+                ('analyze_hound', app.analyze_hound, [(t,) for t in transactions]),
+                ('analyze_fetch', app.analyze_fetch, [(h.fraud_score, t) for h, t in zip(hounds, transactions)]),
+                ('analyze_judge', app.analyze_judge, list(zip(hounds, fetches, transactions))),
+                ('run_pipeline', app.run_pipeline, [(t,) for t in transactions]),
+            ):
+                latencies, elapsed, peak = measure(fn, args_list)
+                results.append(summarize(name, latencies, elapsed, peakBytes=peak, **extra))
+                print(_line(results[-1]), file=sys.stderr)
+
+            batch = sample_transactions(batch_size)
+            latencies, elapsed, peak = measure(app.run_pipeline_batch, [(batch,)] * 5, warmup=1)
+            results.append(summarize('run_pipeline_batch', latencies, elapsed, ops=len(batch) * len(latencies),
+                                     batchSize=batch_size, peakBytes=peak, **extra))
+            print(_line(results[-1]), file=sys.stderr)
+    finally:
+        app.historical_store = original
+    return results
+
+
+def bench_http(calls, batch_size):
+    client = app.app.test_client()
+    transactions = sample_transactions(calls)
+    batch = sample_transactions(batch_size)
+    results = []
+
+    def post(path, body):
+        response = client.post(path, json=body)
+        assert response.status_code == 200, (path, response.status_code)
+
+    def staged(i, t):
+        session_id = f'bench-{i}'
+        post('/api/analyze/hound', {'sessionId': session_id, 'transaction': t})
+        post('/api/analyze/fetch', {'sessionId': session_id})
+        post('/api/analyze/judge', {'sessionId': session_id})
+
+    for name, fn, args_list, ops_per_call in (
+        ('GET /', lambda: client.get('/', headers={'Accept-Encoding': 'br, gzip'}), [()] * calls, 1),
+        ('POST /api/analyze', lambda i, t: post('/api/analyze', {'sessionId': f'bench-{i}', 'transaction': t}),
+         list(enumerate(transactions)), 1),
+        ('POST hound+fetch+judge', staged, list(enumerate(transactions)), 1),
+        ('POST /api/analyze/batch', lambda: post('/api/analyze/batch', batch), [()] * 5, batch_size),
+    ):
+        latencies, elapsed, peak = measure(fn, args_list, warmup=1)
+        results.append(summarize(name, latencies, elapsed, ops=len(latencies) * ops_per_call, peakBytes=peak))
+        print(_line(results[-1]), file=sys.stderr)
+    return results
+
+
+def bench_gunicorn(workers, threads, concurrency, calls):
+    """Spawn gunicorn on a free local port and drive /api/analyze from concurrent clients"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    here = os.path.dirname(os.path.abspath(__file__))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), '--worker-class', 'gthread', '--threads', str(threads)],
+        cwd=here, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, 'SESSION_BACKEND': os.environ.get('SESSION_BACKEND', 'memory')})
+    url = f'http://127.0.0.1:{port}'
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(url + '/api/store/stats', timeout=1).read()
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError('gunicorn did not come up')
+
+        transactions = sample_transactions(calls)
+        latencies, lock = [], threading.Lock()
+
+        def client(offset):
+            local = []
+            for i in range(offset, calls, concurrency):
+                body = json.dumps({'sessionId': f'bench-{i}', 'transaction': transactions[i]}).encode()
+                req = urllib.request.Request(url + '/api/analyze', data=body, headers={'Content-Type': 'application/json'})
+                t0 = time.perf_counter()
+                urllib.request.urlopen(req, timeout=30).read()
+                local.append(time.perf_counter() - t0)
+            with lock:
+                latencies.extend(local)
+
+        started = time.perf_counter()
+        pool = [threading.Thread(target=client, args=(k,)) for k in range(concurrency)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    # ru_maxrss of reaped children is the largest gunicorn process (KiB on Linux)
+    peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+    result = summarize('gunicorn POST /api/analyze', latencies, elapsed, workers=workers, threads=threads,
+                       concurrency=concurrency, peakRssBytes=peak_rss)
+    print(_line(result), file=sys.stderr)
+    return [result]
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = {_key(r): r for r in json.load(f)['results']}
+    with open(after_path) as f:
+        after = json.load(f)['results']
+    print(f'{"benchmark":<48} {"p50 before":>11} {"p50 after":>11} {"change":>8}')
+    for r in after:
+        old = before.get(_key(r))
+        if old is None or not old['p50Ms']:
+            continue
+        change = (r['p50Ms'] - old['p50Ms']) / old['p50Ms'] * 100
+        print(f'{_key(r):<48} {old["p50Ms"]:>11.4f} {r["p50Ms"]:>11.4f} {change:>+7.1f}%')
+
+
+def _key(result):
+    rows = result.get('storeRows')
+    return f'{result["name"]} @ {rows:,} rows' if rows is not None else result['name']
+
+
+def _line(result):
+    return f'{_key(result):<48} p50 {result["p50Ms"]:.4f} ms  p99 {result["p99Ms"]:.4f} ms  {result["opsPerSec"]} ops/s'
+
+
+def run_metadata(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'suite': args.suite,
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'args': {k: v for k, v in vars(args).items() if k not in ('suite', 'out')},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Hound/Fetch/Judge engines and endpoints')
+    sub = parser.add_subparsers(dest='suite', required=True)
+
+    engines = sub.add_parser('engines', help='micro-benchmarks of the analyze functions')
+    engines.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                         help='comma-separated historical store sizes')
+    engines.add_argument('--calls', type=int, default=500)
+    engines.add_argument('--batch-size', type=int, default=5000)
+
+    http = sub.add_parser('http', help='endpoints through the Flask test client')
+    http.add_argument('--calls', type=int, default=500)
+    http.add_argument('--batch-size', type=int, default=2000)
+
+    guni = sub.add_parser('gunicorn', help='/api/analyze against a locally spawned gunicorn')
+    guni.add_argument('--workers', type=int, default=2)
+    guni.add_argument('--threads', type=int, default=4)
+    guni.add_argument('--concurrency', type=int, default=8)
+    guni.add_argument('--calls', type=int, default=2000)
+
+    cmp = sub.add_parser('compare', help='compare p50 latencies of two result files')
+    cmp.add_argument('before')
+    cmp.add_argument('after')
+
+    for p in (engines, http, guni):
+        p.add_argument('--out', help='write results as JSON to this path (default stdout)')
+
+    args = parser.parse_args(argv)
+    if args.suite == 'compare':
+        compare(args.before, args.after)
+        return
+
+    if args.suite == 'engines':
+        results = bench_engines([int(s) for s in args.sizes.split(',')], args.calls, args.batch_size)
+    elif args.suite == 'http':
+        results = bench_http(args.calls, args.batch_size)
+    else:
+        results = bench_gunicorn(args.workers, args.threads, args.concurrency, args.calls)
+
+    report = json.dumps({'meta': run_metadata(args), 'results': results}, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
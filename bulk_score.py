@@ -0,0 +1,222 @@
+# bulk_score.py - Offline bulk scoring of CSV/NDJSON transaction dumps
+#
+#   python bulk_score.py transactions.csv verdicts.csv
+#   python bulk_score.py transactions.ndjson verdicts.ndjson --workers 8 --chunk-size 20000
+#
+# Chunks are scored by app.run_pipeline_batch in a process pool, the same
+# rule code behind /api/analyze/batch, so offline and online verdicts agree.
+# Rows that cannot be scored are written out with an `error` column instead of
+# verdicts, and the rest of the file keeps going.
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import app
+
+VERDICT_FIELDS = ('fraudScore', 'confidence', 'factors', 'similarCount', 'fraudRate', 'anomalies',
+                  'finalScore', 'classification', 'recommendation')
+NUMERIC_FIELDS = ('transactionAmount', 'previousTransactions', 'accountAge')
+
+
+def detect_format(path, override=None):
+    if override:
+        return override
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def parse_number(value):
+    """int or float for a CSV cell, or the cell unchanged if it is not a number"""
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def read_transactions(f, fmt):
+    if fmt == 'csv':
+        for row in csv.DictReader(f):
+            for field in NUMERIC_FIELDS:
+                if row.get(field) not in (None, ''):
+                    row[field] = parse_number(row[field])
+            yield row
+    else:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Passed on as text; score_chunk reports it as not an object
+                yield line
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score_chunk(transactions):
+    """Score one chunk with the online batch pipeline and flatten the verdicts.
+
+    Rows the pipeline cannot score come back in place as the input plus an
+    `error` message.
+    """
+    errors = {}
+    for i, transaction in enumerate(transactions):
+        error = app.transaction_error(transaction)
+        if error:
+            errors[i] = error
+    valid = [t for i, t in enumerate(transactions) if i not in errors]
+    try:
+        results = iter(app.run_pipeline_batch(valid))
+    except (KeyError, TypeError, ValueError):
+        # Something the up-front check does not know about; find the rows
+        # responsible by scoring one at a time
+        results = iter(_score_each(valid))
+
+    scored = []
+    for i, transaction in enumerate(transactions):
+        if i in errors:
+            scored.append(_error_row(transaction, errors[i]))
+            continue
+        result = next(results)
+        if 'error' in result:
+            scored.append(_error_row(transaction, result['error']))
+            continue
+        hound, fetch, judge = result['hound'], result['fetch'], result['judge']
+        scored.append({
+            **transaction,
+            'fraudScore': hound['fraudScore'],
+            'confidence': hound['confidence'],
+            'factors': hound['factors'],
+            'similarCount': fetch['similarCount'],
+            'fraudRate': fetch['fraudRate'],
+            'anomalies': fetch['anomalies'],
+            'finalScore': judge['finalScore'],
+            'classification': judge['classification'],
+            'recommendation': judge['recommendation'],
+        })
+    return scored
+
+
+def _score_each(transactions):
+    for transaction in transactions:
+        try:
+            yield app.run_pipeline_batch([transaction])[0]
+        except (KeyError, TypeError, ValueError) as e:
+            yield {'error': f'{type(e).__name__}: {e}'}
+
+
+def _error_row(transaction, error):
+    if not isinstance(transaction, dict):
+        transaction = {'input': transaction}
+    return {**transaction, 'error': error}
+
+
+class VerdictWriter:
+    def __init__(self, f, fmt):
+        self.f = f
+        self.fmt = fmt
+        self.csv = None
+
+    def write(self, rows):
+        if self.fmt == 'ndjson':
+            self.f.writelines(json.dumps(row) + '\n' for row in rows)
+            return
+        if self.csv is None:
+            input_fields = [k for k in rows[0] if k not in VERDICT_FIELDS and k != 'error']
+            self.csv = csv.DictWriter(self.f, fieldnames=input_fields + list(VERDICT_FIELDS) + ['error'],
+                                      extrasaction='ignore')
+            self.csv.writeheader()
+        for row in rows:
+            if 'error' in row:
+                self.csv.writerow(row)
+            else:
+                self.csv.writerow({**row, 'factors': '; '.join(row['factors']),
+                                   'anomalies': '; '.join(row['anomalies'])})
+
+
+def score_file(input_path, output_path, input_format=None, output_format=None, chunk_size=10000, workers=None,
+               progress_every=2.0, log=sys.stderr):
+    """Stream input_path through the scoring pool into output_path, preserving input order.
+
+    At most two chunks per worker are in flight, so memory stays flat
+    whatever the file size.
+    """
+    workers = workers or os.cpu_count() or 1
+    input_format = detect_format(input_path, input_format)
+    output_format = detect_format(output_path, output_format)
+
+    started = last_report = time.perf_counter()
+    rows_done = errors = 0
+    with open(input_path, newline='') as src, open(output_path, 'w', newline='') as dst, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=_fork_context()) as pool:
+        writer = VerdictWriter(dst, output_format)
+        pending = deque()
+        chunks = chunked(read_transactions(src, input_format), chunk_size)
+
+        def drain_one():
+            nonlocal rows_done, errors, last_report
+            rows = pending.popleft().result()
+            writer.write(rows)
+            rows_done += len(rows)
+            errors += sum('error' in row for row in rows)
+            now = time.perf_counter()
+            if log and now - last_report >= progress_every:
+                last_report = now
+                print(f'{rows_done:,} rows  {rows_done / (now - started):,.0f} rows/s', file=log)
+
+        for chunk in chunks:
+            pending.append(pool.submit(score_chunk, chunk))
+            if len(pending) >= workers * 2:
+                drain_one()
+        while pending:
+            drain_one()
+
+    elapsed = time.perf_counter() - started
+    if log:
+        print(f'Scored {rows_done:,} rows in {elapsed:.1f}s ({rows_done / elapsed if elapsed else 0:,.0f} rows/s)',
+              file=log)
+        if errors:
+            print(f'{errors:,} rows could not be scored; see the error column', file=log)
+    return rows_done
+
+
+def _fork_context():
+    # Forked workers share this process's historical store; spawned ones would
+    # each rebuild it on import unless HISTORY_SHM_NAME lets them attach to it
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score a CSV/NDJSON transaction file with Hound, Fetch and Judge')
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--input-format', choices=('csv', 'ndjson'), help='default: from the file extension')
+    parser.add_argument('--output-format', choices=('csv', 'ndjson'), help='default: from the file extension')
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--workers', type=int, help='default: one per CPU')
+    args = parser.parse_args(argv)
+    score_file(args.input, args.output, args.input_format, args.output_format, args.chunk_size, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# gunicorn.conf.py - loaded automatically by `gunicorn app:app`
+import gc
+import os
+import shutil
+
+# Workers write Prometheus samples here so /metrics can aggregate all of them.
+# The directory has to exist before the preloaded app creates its metrics.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/fraud-detection-metrics')
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+# Import the app once in the master and fork the workers from it, so the
+# historical store, its indexes and the compiled rules are built once and
+# shared copy-on-write instead of rebuilt by every worker
+preload_app = True
+
+# The gc.freeze() recipe for fork servers: no collections in the master while
+# the app loads (freed objects would leave holes in pages the workers share),
+# freeze everything before forking so a worker's collections never write to
+# the shared objects' headers, and collect normally again in each worker
+gc.disable()
+
+
+def on_starting(server):
+    # Samples left over from a previous master would be double counted. This
+    # runs after the app is preloaded; the master's own sample files go too,
+    # which is fine as workers write theirs under their own pids.
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def pre_fork(server, worker):
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
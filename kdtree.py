@@ -0,0 +1,112 @@
+# kdtree.py - NumPy KD-tree for k-nearest-neighbour queries
+import heapq
+import time
+
+import numpy as np
+
+
+class KDTree:
+    """Static KD-tree over an (n, d) point array, built once and queried per point.
+
+    Each node splits its points at the median of their widest dimension, so
+    the tree is balanced and a query descends O(log n) levels before the
+    pruning test (distance to the splitting plane) discards most of the
+    other branches. Points are reordered so every leaf is a contiguous slice
+    of self.points; self.rows maps those positions back to input row ids.
+    """
+
+    def __init__(self, points, leaf_size=32):
+        started = time.perf_counter()
+        points = np.asarray(points, dtype=np.float64)
+        n = len(points)
+        rows = np.arange(n, dtype=np.int32 if n < 2**31 else np.int64)
+
+        # Nodes are parallel lists: split dimension (-1 for a leaf), split
+        # value, child ids and the [start, end) slice of rows they cover
+        dims, splits, lefts, rights, starts, ends = [], [], [], [], [], []
+        stack = [(0, n, None, None)]
+        while stack:
+            start, end, parent, side = stack.pop()
+            node = len(dims)
+            if parent is not None:
+                (lefts if side == 0 else rights)[parent] = node
+            starts.append(start)
+            ends.append(end)
+            lefts.append(-1)
+            rights.append(-1)
+            if end - start <= leaf_size:
+                dims.append(-1)
+                splits.append(0.0)
+                continue
+
+            block = points[rows[start:end]]
+            dim = int(np.argmax(block.max(axis=0) - block.min(axis=0)))
+            mid = (end - start) // 2
+            order = np.argpartition(block[:, dim], mid)
+            rows[start:end] = rows[start:end][order]
+            dims.append(dim)
+            splits.append(float(points[rows[start + mid], dim]))
+            stack.append((start + mid, end, node, 1))
+            stack.append((start, start + mid, node, 0))
+
+        self.points = points[rows]
+        self.rows = rows
+        self.dims = dims
+        self.splits = splits
+        self.lefts = lefts
+        self.rights = rights
+        self.starts = starts
+        self.ends = ends
+        self.leaf_size = leaf_size
+        self.build_seconds = time.perf_counter() - started
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def nbytes(self):
+        return self.points.nbytes + self.rows.nbytes + len(self.dims) * 6 * 8
+
+    def query(self, point, k, max_distance=np.inf):
+        """Row ids and distances of the k points nearest to point, nearest first.
+
+        Points farther than max_distance are never returned, so fewer than k
+        rows come back when the neighbourhood is sparse.
+        """
+        point = np.asarray(point, dtype=np.float64)
+        if k <= 0 or not len(self.rows):
+            return self.rows[:0], np.zeros(0)
+
+        best_d2 = np.zeros(0)
+        best_pos = np.zeros(0, dtype=np.int64)
+        bound = max_distance * max_distance
+
+        # Nearest-first traversal keyed on a lower bound of each node's distance
+        heap = [(0.0, 0)]
+        while heap:
+            lower, node = heapq.heappop(heap)
+            if lower > bound:
+                break
+            dim = self.dims[node]
+            if dim >= 0:
+                diff = point[dim] - self.splits[node]
+                near, far = (self.lefts[node], self.rights[node]) if diff < 0 else (self.rights[node], self.lefts[node])
+                heapq.heappush(heap, (lower, near))
+                heapq.heappush(heap, (max(lower, diff * diff), far))
+                continue
+
+            start, end = self.starts[node], self.ends[node]
+            d2 = ((self.points[start:end] - point) ** 2).sum(axis=1)
+            keep = d2 <= bound
+            if not keep.any():
+                continue
+            best_d2 = np.concatenate([best_d2, d2[keep]])
+            best_pos = np.concatenate([best_pos, np.arange(start, end)[keep]])
+            if len(best_d2) > k:
+                top = np.argpartition(best_d2, k - 1)[:k]
+                best_d2, best_pos = best_d2[top], best_pos[top]
+            if len(best_d2) == k:
+                bound = min(bound, float(best_d2.max()))
+
+        order = np.argsort(best_d2, kind='stable')
+        return self.rows[best_pos[order]], np.sqrt(best_d2[order])
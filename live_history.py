@@ -0,0 +1,434 @@
+# live_history.py - Analyst decisions fed back into Agent Fetch's history
+import fcntl
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from store import (MASSIVE_HISTORY, TINY_AMOUNT, HistoricalStore, NeighborIndex, add_totals, cluster_stats,
+                   legitimate_pattern)
+from shared_store import publish
+
+EMPTY_TOTALS = (0, 0.0, 0, 0, 0, 0)
+
+
+class DeltaSegment:
+    """Rows appended since the last compaction, in arrival order.
+
+    Columns grow by doubling, and rows below len() are never rewritten, so
+    a view taken under the lock stays valid after it is released. Running
+    (count, amount, prev, age, fraud, pattern) totals per fraudScore are
+    updated on every append; Fetch's fraudScore clause then costs one
+    lookup per score in the window and only the amount/history clause
+    scans the rows, of which compaction keeps few.
+    """
+
+    def __init__(self, capacity=1024):
+        self.amount = np.zeros(capacity, dtype=np.float64)
+        self.previous_transactions = np.zeros(capacity, dtype=np.int64)
+        self.account_age = np.zeros(capacity, dtype=np.int32)
+        self.fraud_score = np.zeros(capacity, dtype=np.int16)
+        self.is_fraud = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        self.buckets = {}
+
+    def __len__(self):
+        return self.size
+
+    def append(self, amount, previous_transactions, account_age, fraud_score, is_fraud):
+        if self.size == len(self.amount):
+            for name in ('amount', 'previous_transactions', 'account_age', 'fraud_score', 'is_fraud'):
+                old = getattr(self, name)
+                grown = np.zeros(len(old) * 2, dtype=old.dtype)
+                grown[:len(old)] = old
+                setattr(self, name, grown)
+        i = self.size
+        self.amount[i] = amount
+        self.previous_transactions[i] = previous_transactions
+        self.account_age[i] = account_age
+        self.fraud_score[i] = fraud_score
+        self.is_fraud[i] = is_fraud
+        self.size = i + 1
+
+        pattern = amount < TINY_AMOUNT and previous_transactions > MASSIVE_HISTORY and not is_fraud
+        row = (1, float(amount), int(previous_transactions), int(account_age), int(bool(is_fraud)), int(pattern))
+        self.buckets[int(fraud_score)] = add_totals(self.buckets.get(int(fraud_score), EMPTY_TOTALS), row)
+
+    def columns(self, size=None):
+        """(amount, previousTransactions, accountAge, fraudScore, isFraud) views of the first size rows"""
+        n = self.size if size is None else size
+        return (self.amount[:n], self.previous_transactions[:n], self.account_age[:n], self.fraud_score[:n],
+                self.is_fraud[:n])
+
+    def rows_totals(self, rows):
+        amount, prev, age, _, is_fraud = self.columns()
+        amount, prev, is_fraud = amount[rows], prev[rows], is_fraud[rows]
+        return (len(amount), float(amount.sum()), int(prev.sum()), int(age[rows].sum(dtype=np.int64)),
+                int(is_fraud.sum()), int(legitimate_pattern(amount, prev, is_fraud).sum()))
+
+    def similar_totals(self, fraud_score, amount, previous_transactions):
+        """Totals over the rows matching Fetch's similarity rule"""
+        totals = EMPTY_TOTALS
+        for score in range(math.floor(fraud_score - 20) + 1, math.ceil(fraud_score + 20)):
+            bucket = self.buckets.get(score)
+            if bucket:
+                totals = add_totals(totals, bucket)
+        if not (self.size and amount > 0 and previous_transactions > 0):
+            return totals
+
+        amounts, prevs, _, scores, _ = self.columns()
+        extra = ((np.abs(scores.astype(np.float64) - fraud_score) >= 20)
+                 & (np.abs(amounts - amount) < amount * 0.5)
+                 & (np.abs(prevs - previous_transactions) < previous_transactions * 0.5))
+        return add_totals(totals, self.rows_totals(np.flatnonzero(extra)))
+
+
+class LiveHistory:
+    """The historical store plus the decisions analysts have labelled since it was built.
+
+    A labelled row lands in a DeltaSegment and counts from the next query
+    on. A background thread folds the delta into a new HistoricalStore
+    once compact_rows rows are waiting or every compact_interval seconds,
+    building its indexes off to the side, and publishes it with a reference
+    swap, so queries never wait on a rebuild.
+
+    With log_path set, the delta is also an NDJSON append log shared by
+    every worker. Appends go to the file, and each process tails it at most
+    every poll_interval seconds, so a decision reaches all workers within
+    that time. The log is replayed from log_offset and compacted at startup.
+
+    With shared set (a shared_store.SharedStore), the base is the published
+    snapshot. Each query checks for a newer generation and swaps it in; with
+    a log, the delta is then rebuilt from the log offset the snapshot was
+    published with.
+
+    Without a log each worker's delta is its own. Folding it into a base
+    that is mapped (a store file, or a shared snapshot) would copy the whole
+    base into the worker's heap, so such a delta is not compacted but capped
+    instead: past compact_rows rows the older half is dropped, and
+    stats()['droppedRows'] counts it. Set a log to keep every decision.
+
+    Compacting a shared log in every worker would give each its own copy of
+    the base again. Instead one process at a time (holding an flock on
+    <log_path>.lock) builds the new base and publishes it, as the next
+    shared generation or, with compact_path, as a store file saved there;
+    every process then swaps in the shared segment or the file opened with
+    mmap, and rebuilds its delta from the log offset in the snapshot's meta.
+    The snapshot also records source, and a compact_path file from another
+    source is ignored. With a log but neither, each process compacts in
+    memory.
+    """
+
+    def __init__(self, base, log_path=None, compact_rows=10000, compact_interval=60.0, poll_interval=1.0,
+                 log_offset=0, shared=None, compact_path=None, source=None):
+        self.base = base
+        self.shared = shared
+        self.compact_path = compact_path if log_path else None
+        self.source = source
+        self.delta = DeltaSegment()
+        self.log_path = log_path
+        self.compact_rows = compact_rows
+        self.compact_interval = compact_interval
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._compactor_pid = None
+        self.log_offset = base.meta.get('logOffset', log_offset) if shared is not None else log_offset
+        self._compacted_file = None
+        self._next_poll = 0.0
+        self._base_since = time.time()
+        self.appended = 0
+        self.dropped = 0
+        self.compactions = 0
+        self.last_compaction_ms = None
+        self.last_error = None
+        os.register_at_fork(after_in_child=self._after_fork)
+        if log_path:
+            self.poll(force=True)
+            self.compact()
+
+    def _after_fork(self):
+        # A lock held by another thread at fork time would never be released
+        # in the child, and the parent's compaction thread does not exist there
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._compactor_pid = None
+
+    def __len__(self):
+        return len(self.base) + len(self.delta)
+
+    def append(self, amount, previous_transactions, account_age, fraud_score, is_fraud):
+        """Add one labelled transaction to the history"""
+        if self.log_path:
+            line = json.dumps({
+                'transactionAmount': amount,
+                'previousTransactions': previous_transactions,
+                'accountAge': account_age,
+                'fraudScore': fraud_score,
+                'isFraud': bool(is_fraud),
+            }) + '\n'
+            fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode())
+            finally:
+                os.close(fd)
+            self.poll(force=True)
+        else:
+            with self._lock:
+                self.delta.append(amount, previous_transactions, account_age, fraud_score, is_fraud)
+                self.appended += 1
+                if self._mapped_without_log() and len(self.delta) > self.compact_rows:
+                    self._drop_oldest()
+            self._rows_added()
+
+    def _mapped_without_log(self):
+        return not self.log_path and (self.shared is not None or self.base.path is not None)
+
+    def _drop_oldest(self):
+        # A new segment rather than a shift, so views taken by queries stay valid
+        keep = DeltaSegment()
+        old, size = self.delta, len(self.delta)
+        for i in range(size - self.compact_rows // 2, size):
+            keep.append(*(column[i] for column in old.columns()))
+        self.dropped += size - len(keep)
+        self.delta = keep
+
+    def poll(self, force=False):
+        """Pick up a newly published snapshot, and rows appended to the log since the last poll"""
+        if self.shared is not None:
+            self._check_shared()
+        if not self.log_path or (not force and time.monotonic() < self._next_poll):
+            return
+        if self.compact_path:
+            self._check_compacted()
+        if not self._poll_lock.acquire(blocking=force):
+            return
+        try:
+            self._next_poll = time.monotonic() + self.poll_interval
+            try:
+                with open(self.log_path, 'rb') as f:
+                    f.seek(self.log_offset)
+                    data = f.read()
+            except FileNotFoundError:
+                return
+            # A line still being written has no newline yet; leave it for the next poll
+            end = data.rfind(b'\n') + 1
+            if not end:
+                return
+            records = []
+            for line in data[:end].splitlines():
+                try:
+                    records.append(json.loads(line))
+                except ValueError as e:
+                    self.last_error = f'Skipped history log line: {e}'
+            self.log_offset += end
+            with self._lock:
+                for r in records:
+                    self.delta.append(r['transactionAmount'], r['previousTransactions'], r['accountAge'],
+                                      r['fraudScore'], r['isFraud'])
+                self.appended += len(records)
+        finally:
+            self._poll_lock.release()
+        self._rows_added()
+
+    def _check_shared(self):
+        store = self.shared.current()
+        if store is not None and store is not self.base:
+            self._adopt(store)
+
+    def _check_compacted(self):
+        """Swap in the compact_path store when another process (or this one) has rewritten it"""
+        try:
+            stat = os.stat(self.compact_path)
+        except FileNotFoundError:
+            return
+        identity = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if identity == self._compacted_file:
+            return
+        self._compacted_file = identity
+        try:
+            store = HistoricalStore.open(self.compact_path)
+            log_size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        except (OSError, ValueError) as e:
+            self.last_error = f'Could not open {self.compact_path}: {e}'
+            return
+        if self.source is not None and store.meta.get('source') != self.source:
+            self.last_error = f'Ignored {self.compact_path}: compacted from another history'
+            return
+        if store.meta.get('logOffset', 0) > log_size:
+            self.last_error = f'Ignored {self.compact_path}: compacted from another log'
+            return
+        self._adopt(store)
+
+    def _adopt(self, store):
+        """Make a published snapshot the base; with a log, the delta restarts from the snapshot's log offset"""
+        if self.base._neighbors is not None:
+            store.neighbors
+        # Under the poll lock, so no log read in flight lands in the new delta
+        with self._poll_lock, self._lock:
+            self.base = store
+            self._base_since = time.time()
+            if self.log_path:
+                self.delta = DeltaSegment()
+                self.log_offset = store.meta.get('logOffset', 0)
+        if self.log_path:
+            self.poll(force=True)
+
+    def _rows_added(self):
+        if self._mapped_without_log():
+            return
+        # The compaction thread is started on first use, once per process
+        if self._compactor_pid != os.getpid():
+            self._compactor_pid = os.getpid()
+            threading.Thread(target=self._compact_loop, name='history-compact', daemon=True).start()
+        if len(self.delta) >= self.compact_rows:
+            self._wake.set()
+
+    def _compact_loop(self):
+        while True:
+            self._wake.wait(self.compact_interval)
+            self._wake.clear()
+            try:
+                self.compact(when_due=True)
+            except Exception as e:
+                self.last_error = f'Compaction failed: {e!r}'
+
+    def compact(self, when_due=False):
+        """Fold the delta into a new base store; returns the number of rows folded in.
+
+        With when_due, only once compact_rows rows are waiting or the base
+        is compact_interval seconds old.
+        """
+        if self._mapped_without_log():
+            return 0
+        with self._compact_lock:
+            if self.shared is not None or self.compact_path:
+                return self._compact_published(when_due)
+            with self._lock:
+                base, delta, taken = self.base, self.delta, len(self.delta)
+            if not taken or (when_due and not self._due(base, taken)):
+                return 0
+
+            started = time.perf_counter()
+            amount, prev, age, score, is_fraud = delta.columns(taken)
+            merged = HistoricalStore.from_columns(
+                np.concatenate([base.amount, amount]),
+                np.concatenate([base.previous_transactions, prev]),
+                np.concatenate([base.account_age, age]),
+                np.concatenate([base.fraud_score, score]),
+                np.concatenate([base.is_fraud, is_fraud]),
+            )
+            merged.index
+            if base._neighbors is not None:
+                merged._neighbors = NeighborIndex(merged)
+
+            with self._lock:
+                # Rows that arrived while the new base was being built start the next delta
+                rest = DeltaSegment()
+                for i in range(taken, len(self.delta)):
+                    rest.append(*(column[i] for column in self.delta.columns()))
+                self.base, self.delta = merged, rest
+                self._base_since = time.time()
+            self.compactions += 1
+            self.last_compaction_ms = round((time.perf_counter() - started) * 1000, 3)
+            return taken
+
+    def _due(self, base, taken):
+        # A base that was never compacted counts its age from when it was loaded
+        age = time.time() - base.meta.get('compactedAt', self._base_since)
+        return taken >= self.compact_rows or age >= self.compact_interval
+
+    def _compact_published(self, when_due):
+        fd = os.open(f'{self.log_path}.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0  # another process is compacting; its snapshot is picked up on a later poll
+            # Start from the latest snapshot, so rows another process folded in are not folded twice
+            self.poll(force=True)
+            with self._poll_lock, self._lock:
+                base, delta, taken, offset = self.base, self.delta, len(self.delta), self.log_offset
+            if not taken or (when_due and not self._due(base, taken)):
+                return 0
+
+            started = time.perf_counter()
+            merged = HistoricalStore.from_columns(*(np.concatenate([old, new]) for old, new in zip(
+                (base.amount, base.previous_transactions, base.account_age, base.fraud_score, base.is_fraud),
+                delta.columns(taken))))
+            meta = {**base.meta, 'logOffset': offset, 'compactedAt': time.time()}
+            if self.source is not None:
+                meta['source'] = self.source
+            if self.shared is not None:
+                publish(merged, self.shared.name, meta)
+            else:
+                merged.save(self.compact_path, meta)
+            del merged
+            self.compactions += 1
+            self.last_compaction_ms = round((time.perf_counter() - started) * 1000, 3)
+            self.poll(force=True)
+            return taken
+        finally:
+            os.close(fd)
+
+    def similar(self, fraud_score, amount, previous_transactions):
+        return cluster_stats(self.similar_totals(fraud_score, amount, previous_transactions))
+
+    def similar_totals(self, fraud_score, amount, previous_transactions):
+        self.poll()
+        with self._lock:
+            base = self.base
+            delta = self.delta.similar_totals(fraud_score, amount, previous_transactions)
+        return add_totals(base.similar_totals(fraud_score, amount, previous_transactions), delta)
+
+    def nearest(self, fraud_score, amount, previous_transactions, account_age, k, max_distance=np.inf):
+        return cluster_stats(self.nearest_totals(fraud_score, amount, previous_transactions, account_age, k,
+                                                 max_distance))
+
+    def nearest_totals(self, fraud_score, amount, previous_transactions, account_age, k, max_distance=np.inf):
+        """k nearest over the base's KD-tree and a scan of the delta, merged by distance"""
+        self.poll()
+        with self._lock:
+            base, delta = self.base, self.delta
+            columns = delta.columns()
+        rows, distances = base.neighbors.query(fraud_score, amount, previous_transactions, account_age, k,
+                                               max_distance)
+        if not len(columns[0]):
+            return base.totals(0, 0, rows)
+
+        neighbors = base.neighbors
+        point = neighbors.point(fraud_score, amount, previous_transactions, account_age)[0]
+        delta_distances = np.sqrt(((neighbors.point(columns[3], columns[0], columns[1], columns[2]) - point) ** 2)
+                                  .sum(axis=1))
+        combined = np.concatenate([distances, delta_distances])
+        order = np.argsort(combined, kind='stable')
+        pick = order[combined[order] <= max_distance][:k]
+        base_pick = rows[pick[pick < len(rows)]]
+        delta_pick = pick[pick >= len(rows)] - len(rows)
+        return add_totals(base.totals(0, 0, base_pick), delta.rows_totals(delta_pick))
+
+    def stats(self):
+        self.poll()
+        stats = self.base.stats()
+        stats.update({
+            'rows': len(self),
+            'baseRows': len(self.base),
+            'deltaRows': len(self.delta),
+            'appended': self.appended,
+            'droppedRows': self.dropped,
+            'compactions': self.compactions,
+            'lastCompactionMs': self.last_compaction_ms,
+            'logPath': self.log_path,
+            'compactPath': self.compact_path,
+            'lastError': self.last_error,
+        })
+        if self.shared is not None:
+            stats['shared'] = self.shared.stats()
+        return stats
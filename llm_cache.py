@@ -0,0 +1,159 @@
+# llm_cache.py - Response cache in front of the agents' LLM calls
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_message(message):
+    """Lower-case, collapse whitespace and drop trailing punctuation"""
+    return re.sub(r'\s+', ' ', (message or '').lower()).strip().rstrip('?!. ')
+
+
+def context_hash(context):
+    """Stable hash of the analysis context api_chat builds"""
+    encoded = json.dumps(context, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def cache_key(agent_name, message, context):
+    return f'{agent_name}:{context_hash(context)}:{normalize_message(message)}'
+
+
+class ResponseCache:
+    """LRU + TTL cache of LLM replies with an optional SQLite tier on disk.
+
+    The memory tier is an OrderedDict in least-recently-used order capped at
+    max_entries. When disk_path is set every put is also written to disk,
+    and a memory miss falls through to the disk tier, so warm entries
+    survive a restart. Every prune_every puts the disk tier drops expired
+    rows and its oldest rows past disk_max_entries (max_entries by default).
+    Disk reads and writes hold their own lock, never the memory tier's.
+    """
+
+    EXPIRE = 'DELETE FROM responses WHERE created < ?'
+    TRIM = 'DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY created LIMIT ?)'
+    COUNT = 'SELECT COUNT(*) FROM responses'
+
+    def __init__(self, max_entries=2048, ttl_seconds=86400, disk_path=None, disk_max_entries=None, prune_every=256,
+                 clock=time.time):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.disk_path = disk_path
+        self.disk_max_entries = max_entries if disk_max_entries is None else disk_max_entries
+        self.prune_every = prune_every
+        self._entries = OrderedDict()  # key -> (created, response)
+        self._lock = threading.Lock()
+        self._disk = None
+        self._disk_pid = None
+        self._disk_lock = threading.Lock()
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.disk_expirations = 0
+
+    def _disk_conn(self):
+        # A connection must not cross a fork, so each process opens its own on
+        # first use, and none is opened before gunicorn forks its workers
+        if self._disk_pid != os.getpid():
+            self._disk = sqlite3.connect(self.disk_path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._disk.execute('PRAGMA journal_mode=WAL')
+            self._disk.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)')
+            self._disk.execute('CREATE INDEX IF NOT EXISTS responses_created ON responses (created)')
+            self._disk_pid = os.getpid()
+        return self._disk
+
+    def _fresh(self, created, now):
+        return self.ttl_seconds is None or now - created <= self.ttl_seconds
+
+    def get(self, key):
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._fresh(entry[0], now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+
+        if self.disk_path:
+            with self._disk_lock:
+                row = self._disk_conn().execute('SELECT created, response FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is not None and self._fresh(row[0], now):
+                with self._lock:
+                    self._insert(key, row[0], row[1])
+                    self.disk_hits += 1
+                return row[1]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, response):
+        now = self.clock()
+        with self._lock:
+            self._insert(key, now, response)
+        if not self.disk_path:
+            return
+        with self._disk_lock:
+            self._disk_conn().execute('INSERT OR REPLACE INTO responses (key, response, created) VALUES (?, ?, ?)',
+                                      (key, response, now))
+            self._disk_writes += 1
+            if self._disk_writes % self.prune_every == 0:
+                self._prune(now)
+
+    def prune(self):
+        """Drop expired disk rows and trim the disk tier back to disk_max_entries"""
+        if self.disk_path:
+            with self._disk_lock:
+                self._prune(self.clock())
+
+    def _prune(self, now):
+        conn = self._disk_conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if self.ttl_seconds is not None:
+                self.disk_expirations += conn.execute(self.EXPIRE, (now - self.ttl_seconds,)).rowcount
+            excess = conn.execute(self.COUNT).fetchone()[0] - self.disk_max_entries
+            if excess > 0:
+                self.disk_evictions += conn.execute(self.TRIM, (excess,)).rowcount
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _insert(self, key, created, response):
+        self._entries[key] = (created, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxEntries': self.max_entries,
+            'ttlSeconds': self.ttl_seconds,
+            'hits': self.hits,
+            'diskHits': self.disk_hits,
+            'misses': self.misses,
+            'hitRate': round((self.hits + self.disk_hits) / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+            'diskPath': self.disk_path,
+            'diskMaxEntries': self.disk_max_entries if self.disk_path else None,
+            'diskEvictions': self.disk_evictions,
+            'diskExpirations': self.disk_expirations,
+        }
@@ -0,0 +1,50 @@
+# metrics.py - Prometheus metrics for routes, engines, sessions and LLM calls
+#
+# Under gunicorn, gunicorn.conf.py points PROMETHEUS_MULTIPROC_DIR at a shared
+# directory so every worker writes its samples there and /metrics aggregates
+# them; without it the metrics are per process.
+import os
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+# The engines run in tens of microseconds, so the buckets start well below 1 ms
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_SECONDS = Histogram('fraud_request_seconds', 'Route latency', ['route'], buckets=LATENCY_BUCKETS)
+REQUESTS = Counter('fraud_requests', 'Requests served', ['route', 'status'])
+REQUEST_ERRORS = Counter('fraud_request_errors', 'Requests that raised or returned 5xx', ['route'])
+
+ENGINE_SECONDS = Histogram('fraud_engine_seconds', 'Engine function latency', ['engine'], buckets=LATENCY_BUCKETS)
+ENGINE_ERRORS = Counter('fraud_engine_errors', 'Engine function exceptions', ['engine'])
+
+# Every worker sees the same historical store; in-memory sessions are per worker
+# and add up, while a shared backend reports the same total from each worker
+STORE_ROWS = Gauge('fraud_historical_store_rows', 'Rows in the historical store', multiprocess_mode='livemax')
+SESSIONS = Gauge('fraud_sessions', 'Entries in the session store',
+                 multiprocess_mode='livemax' if os.environ.get('SESSION_BACKEND') == 'sqlite' else 'livesum')
+
+LLM_SECONDS = Histogram('fraud_llm_seconds', 'Upstream LLM call latency', buckets=LATENCY_BUCKETS)
+LLM_FALLBACKS = Counter('fraud_llm_fallbacks', 'Chat replies served from the template fallback', ['reason'])
+LLM_CACHE_HITS = Counter('fraud_llm_cache_hits', 'Chat replies served from the response cache')
+
+
+def timed(engine):
+    """Decorator recording an engine function's latency and exceptions"""
+    seconds = ENGINE_SECONDS.labels(engine)
+    errors = ENGINE_ERRORS.labels(engine)
+
+    def wrap(fn):
+        return errors.count_exceptions()(seconds.time()(fn))
+    return wrap
+
+
+def render():
+    """Current metrics in Prometheus text format, aggregated across workers when multiprocess"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
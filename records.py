@@ -0,0 +1,258 @@
+# records.py - Compact session records for the agent pipeline
+#
+# The agents return slotted records holding numbers and small codes rather
+# than dicts of strings: timestamps are integer nanoseconds, Hound factors are
+# codes into an interned table, and Fetch anomalies and Judge verdicts are
+# bit flags and tiers plus the numbers their messages quote. to_dict()
+# renders the API's JSON shape, so strings only exist while a response is
+# being built. A session holds one SessionRecord.
+import sys
+import threading
+from datetime import datetime
+
+# Fetch anomaly flags, in the order the messages are listed
+AMOUNT_ANOMALY = 1
+PREV_ANOMALY = 2
+AGE_ANOMALY = 4
+PATTERN_ANOMALY = 8
+
+# Judge tiers
+LEGITIMATE, SUSPICIOUS, HIGH_RISK = 0, 1, 2
+CLASSIFICATIONS = ('LEGITIMATE TRANSACTION', 'SUSPICIOUS ACTIVITY', 'HIGH RISK - FRAUD DETECTED')
+
+TRANSACTION_FIELDS = (
+    ('userName', 'user_name'),
+    ('transactionAmount', 'amount'),
+    ('previousTransactions', 'previous_transactions'),
+    ('accountAge', 'account_age'),
+    ('location', 'location'),
+    ('deviceType', 'device_type'),
+    ('timeOfDay', 'time_of_day'),
+)
+
+
+class CodeTable:
+    """Interns strings as small integer codes; codes are only valid in this process"""
+
+    def __init__(self):
+        self._codes = {}
+        self._texts = []
+        self._lock = threading.Lock()
+
+    def code(self, text):
+        code = self._codes.get(text)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(text)
+                if code is None:
+                    code = self._codes[text] = len(self._texts)
+                    self._texts.append(text)
+        return code
+
+    def text(self, code):
+        return self._texts[code]
+
+    def __len__(self):
+        return len(self._texts)
+
+
+FACTORS = CodeTable()
+
+
+def iso_timestamp(ns):
+    """Local-time ISO string for a time.time_ns() value, as datetime.now().isoformat() gives"""
+    return datetime.fromtimestamp(ns // 1_000_000_000).replace(microsecond=ns // 1000 % 1_000_000).isoformat()
+
+
+def anomaly_messages(flags, amount, prev, age, avg_amount, avg_prev, avg_age):
+    """Fetch's anomaly strings for a set of anomaly flags"""
+    messages = []
+    if flags & AMOUNT_ANOMALY:
+        messages.append(f'Transaction Amount (${amount} vs cluster avg ${avg_amount:.2f})')
+    if flags & PREV_ANOMALY:
+        messages.append(f'Previous Transactions ({prev:,} vs cluster avg {avg_prev:.0f})')
+    if flags & AGE_ANOMALY:
+        messages.append(f'Account Age ({age} days vs cluster avg {avg_age:.0f} days)')
+    if flags & PATTERN_ANOMALY:
+        messages.append('CRITICAL: No legitimate user shows this tiny amount + massive history pattern')
+    return messages
+
+
+def recommendation(tier, amount, prev):
+    """Judge's recommendation for a tier"""
+    if tier == HIGH_RISK:
+        return f'Block transaction immediately. ${amount} with {prev:,} previous transactions is extremely suspicious.'
+    if tier == SUSPICIOUS:
+        return 'Flag for manual review. Unusual pattern detected.'
+    return 'Approve transaction'
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class Record:
+    """Base for slotted records; state() is the JSON-safe form SQLite sessions store"""
+
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def state(self):
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(*state)
+
+
+class TransactionRecord(Record):
+    """The submitted transaction; fields the form does not send go in extra"""
+
+    __slots__ = tuple(name for _, name in TRANSACTION_FIELDS) + ('extra',)
+
+    @classmethod
+    def from_dict(cls, transaction):
+        known = dict(TRANSACTION_FIELDS)
+        record = cls(*(_intern(transaction.get(key)) for key, _ in TRANSACTION_FIELDS))
+        extra = {sys.intern(k): _intern(v) for k, v in transaction.items() if k not in known}
+        record.extra = extra or None
+        return record
+
+    def to_dict(self):
+        transaction = {key: getattr(self, name) for key, name in TRANSACTION_FIELDS if getattr(self, name) is not None}
+        if self.extra:
+            transaction.update(self.extra)
+        return transaction
+
+    def state(self):
+        return self.to_dict()
+
+    @classmethod
+    def from_state(cls, state):
+        return cls.from_dict(state)
+
+
+class HoundResult(Record):
+    __slots__ = ('fraud_score', 'confidence', 'factor_codes', 'timestamp_ns')
+
+    @classmethod
+    def create(cls, fraud_score, confidence, factors, timestamp_ns):
+        return cls(fraud_score, confidence, tuple(FACTORS.code(f) for f in factors), timestamp_ns)
+
+    @property
+    def factors(self):
+        return [FACTORS.text(code) for code in self.factor_codes]
+
+    def to_dict(self):
+        return {
+            'fraudScore': self.fraud_score,
+            'confidence': self.confidence,
+            'factors': self.factors,
+            'timestamp': iso_timestamp(self.timestamp_ns)
+        }
+
+    def state(self):
+        # Codes are per process, so the stored form carries the names
+        return [self.fraud_score, self.confidence, self.factors, self.timestamp_ns]
+
+    @classmethod
+    def from_state(cls, state):
+        return cls.create(*state)
+
+
+class FetchResult(Record):
+    __slots__ = ('similar_count', 'fraud_rate', 'anomaly_flags', 'amount', 'previous_transactions', 'account_age',
+                 'avg_amount', 'avg_prev', 'avg_age', 'timestamp_ns')
+
+    @property
+    def anomaly_count(self):
+        return bin(self.anomaly_flags).count('1')
+
+    @property
+    def anomalies(self):
+        return anomaly_messages(self.anomaly_flags, self.amount, self.previous_transactions, self.account_age,
+                                self.avg_amount, self.avg_prev, self.avg_age)
+
+    def to_dict(self):
+        return {
+            'similarCount': self.similar_count,
+            'fraudRate': self.fraud_rate,
+            'anomalies': self.anomalies,
+            'timestamp': iso_timestamp(self.timestamp_ns)
+        }
+
+
+class JudgeResult(Record):
+    __slots__ = ('final_score', 'tier', 'amount', 'previous_transactions', 'timestamp_ns')
+
+    @property
+    def classification(self):
+        return CLASSIFICATIONS[self.tier]
+
+    @property
+    def recommendation(self):
+        return recommendation(self.tier, self.amount, self.previous_transactions)
+
+    def to_dict(self):
+        return {
+            'classification': self.classification,
+            'finalScore': self.final_score,
+            'recommendation': self.recommendation,
+            'timestamp': iso_timestamp(self.timestamp_ns)
+        }
+
+
+class SessionRecord:
+    """Everything kept for one session. get() and update() take the session's field names."""
+
+    __slots__ = ('transaction', 'hound', 'fetch', 'judge', 'decision', 'learned')
+    TYPES = {'transaction': TransactionRecord, 'hound': HoundResult, 'fetch': FetchResult, 'judge': JudgeResult}
+
+    def __init__(self):
+        self.transaction = self.hound = self.fetch = self.judge = self.decision = None
+        self.learned = False
+
+    def get(self, field, default=None):
+        value = getattr(self, field, None) if field in self.__slots__ else None
+        return default if value is None else value
+
+    def update(self, fields):
+        for field, value in fields.items():
+            if field == 'transaction' and isinstance(value, dict):
+                value = TransactionRecord.from_dict(value)
+            elif field == 'decision':
+                value = _intern(value)
+            elif field not in self.__slots__:
+                raise KeyError(f'Unknown session field {field!r}')
+            setattr(self, field, value)
+
+    def to_dict(self):
+        """The session rendered in the API's shape"""
+        session = {}
+        for field in self.__slots__:
+            value = getattr(self, field)
+            if value is not None:
+                session[field] = value.to_dict() if isinstance(value, Record) else value
+        return session
+
+    def state(self):
+        state = {}
+        for field in self.__slots__:
+            value = getattr(self, field)
+            if value is not None:
+                state[field] = value.state() if isinstance(value, Record) else value
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        record = cls()
+        for field, value in state.items():
+            if field not in cls.__slots__ or (field in cls.TYPES and field != 'transaction' and not isinstance(value, list)):
+                continue  # written by an older version
+            if field in cls.TYPES:
+                value = cls.TYPES[field].from_state(value)
+            setattr(record, field, value)
+        return record
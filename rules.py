@@ -0,0 +1,215 @@
+# rules.py - Data-driven rule engine for Agent Hound
+#
+# A rule set is a JSON (or YAML) document:
+#
+#   baseScore / minScore / maxScore   starting score and clamp range
+#   confidence                        {"base", "perFactor", "max"}
+#   rules                             list of {"factor", "score", "when", "group"?}
+#
+# "when" maps a transaction field to {operator: value} conditions, all of which
+# must hold. Rules fire in file order and append their factor; among rules
+# sharing a "group" only the first match fires, which expresses an if/elif chain.
+import json
+import operator
+import os
+import threading
+import time
+
+import numpy as np
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+
+class RuleError(ValueError):
+    """A rule set that cannot be compiled"""
+
+
+class Condition:
+    def __init__(self, field, op, value):
+        if op not in OPERATORS:
+            raise RuleError(f'Unknown operator {op!r} on {field}')
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise RuleError(f'{field} {op} needs a number or string, got {value!r}')
+        if isinstance(value, str) and op not in ('==', '!='):
+            raise RuleError(f'{field} {op} cannot compare against a string')
+        self.field = field
+        self.op = OPERATORS[op]
+        self.value = value
+        self.numeric = not isinstance(value, str)
+        self.column = field if self.numeric else field + ':str'
+
+    def test(self, transaction):
+        value = transaction.get(self.field)
+        if value is None or isinstance(value, str) == self.numeric:
+            return False
+        return self.op(value, self.value)
+
+    def test_batch(self, cols):
+        column = cols[self.column]
+        if self.numeric:
+            # Missing values are NaN and never match, as in test()
+            return self.op(column, self.value) & ~np.isnan(column)
+        return np.asarray(self.op(column, self.value), dtype=bool)
+
+
+class RuleSet:
+    """A compiled rule set, evaluated per transaction or over a batch of columns"""
+
+    def __init__(self, spec, source=None):
+        try:
+            self.base_score = spec['baseScore']
+            self.min_score = spec.get('minScore', 0)
+            self.max_score = spec.get('maxScore', 100)
+            confidence = spec['confidence']
+            self.confidence_base = confidence['base']
+            self.confidence_per_factor = confidence['perFactor']
+            self.confidence_max = confidence['max']
+            rules = spec['rules']
+            if len(rules) > 63:
+                raise RuleError('At most 63 rules are supported')
+            self.factors = tuple(rule['factor'] for rule in rules)
+            self.scores = np.array([rule['score'] for rule in rules], dtype=np.int64)
+            self.groups = [rule.get('group') for rule in rules]
+            self.conditions = [
+                [Condition(field, op, value) for field, ops in rule['when'].items() for op, value in ops.items()]
+                for rule in rules
+            ]
+        except (KeyError, TypeError, AttributeError) as e:
+            raise RuleError(f'Malformed rule set: {e!r}') from None
+
+        self.version = spec.get('version')
+        self.source = source
+        self.numeric_fields = sorted({c.field for cs in self.conditions for c in cs if c.numeric})
+        self.string_fields = sorted({c.field for cs in self.conditions for c in cs if not c.numeric})
+
+    def evaluate(self, transaction):
+        """(fraudScore, confidence, factors) for one transaction dict"""
+        score = self.base_score
+        factors = []
+        fired_groups = set()
+        for i, conditions in enumerate(self.conditions):
+            group = self.groups[i]
+            if group is not None and group in fired_groups:
+                continue
+            if all(c.test(transaction) for c in conditions):
+                score += int(self.scores[i])
+                factors.append(self.factors[i])
+                if group is not None:
+                    fired_groups.add(group)
+        score = min(max(score, self.min_score), self.max_score)
+        confidence = min(self.confidence_max, self.confidence_base + len(factors) * self.confidence_per_factor)
+        return score, confidence, factors
+
+    def columns(self, transactions):
+        """Typed columns for the fields the rules read; missing numbers become NaN"""
+        cols = {}
+        for field in self.numeric_fields:
+            values = [t.get(field) for t in transactions]
+            cols[field] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        for field in self.string_fields:
+            cols[field + ':str'] = np.array([t.get(field) for t in transactions], dtype=object)
+        return cols
+
+    def evaluate_batch(self, cols, n):
+        """fraudScore, confidence and a per-row bitmask of fired rules over n rows"""
+        score = np.full(n, self.base_score, dtype=np.int64)
+        factor_bits = np.zeros(n, dtype=np.int64)
+        n_factors = np.zeros(n, dtype=np.int64)
+        taken = {group: np.zeros(n, dtype=bool) for group in self.groups if group is not None}
+        for i, conditions in enumerate(self.conditions):
+            fired = np.ones(n, dtype=bool)
+            for c in conditions:
+                fired &= c.test_batch(cols)
+            group = self.groups[i]
+            if group is not None:
+                fired &= ~taken[group]
+                taken[group] |= fired
+            score += self.scores[i] * fired
+            factor_bits |= fired.astype(np.int64) << i
+            n_factors += fired
+        score = np.clip(score, self.min_score, self.max_score)
+        confidence = np.minimum(self.confidence_max, self.confidence_base + n_factors * self.confidence_per_factor)
+        return {'fraudScore': score, 'confidence': confidence, 'factorBits': factor_bits, 'factorNames': self.factors}
+
+
+def load_rules(path):
+    """Read and compile a JSON or YAML rule file"""
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise RuleError(f'PyYAML is needed to read {path}') from None
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    return RuleSet(spec, source=path)
+
+
+class RuleWatcher:
+    """Holds the live RuleSet and swaps in a recompiled one when the file changes.
+
+    current() stats the file at most every check_interval seconds. A new rule
+    set is compiled off to the side and published with a single reference
+    assignment, so requests never wait on a reload and never see a half-built
+    rule set. A file that fails to compile leaves the previous rules in place.
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = os.stat(path).st_mtime_ns
+        self._rules = load_rules(path)
+        self._next_check = time.monotonic() + check_interval
+        self.loaded_at = time.time()
+        self.reloads = 0
+        self.last_error = None
+
+    def current(self):
+        if time.monotonic() >= self._next_check and self._lock.acquire(blocking=False):
+            try:
+                self._next_check = time.monotonic() + self.check_interval
+                if os.stat(self.path).st_mtime_ns != self._mtime:
+                    self.reload()
+            except OSError as e:
+                self.last_error = str(e)
+            finally:
+                self._lock.release()
+        return self._rules
+
+    def reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            self.last_error = str(e)
+            return False
+        try:
+            rules = load_rules(self.path)
+        except (OSError, ValueError) as e:
+            self.last_error = str(e)
+            self._mtime = mtime
+            return False
+        self._rules = rules
+        self._mtime = mtime
+        self.loaded_at = time.time()
+        self.reloads += 1
+        self.last_error = None
+        return True
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'version': self._rules.version,
+            'rules': len(self._rules.factors),
+            'loadedAt': self.loaded_at,
+            'reloads': self.reloads,
+            'lastError': self.last_error,
+        }
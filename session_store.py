@@ -0,0 +1,279 @@
+# session_store.py - Session backends for the agent pipeline
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from records import SessionRecord
+
+
+class SessionBackend:
+    """Interface the Flask routes use to read and write session data.
+
+    Sessions are records.SessionRecord objects. Routes never mutate the
+    record returned by get(); they write through update(), which sets the
+    named fields, so a backend shared between processes sees every change.
+    """
+
+    def get(self, session_id):
+        """SessionRecord for session_id, or None if missing or expired"""
+        raise NotImplementedError
+
+    def update(self, session_id, fields):
+        """Merge fields into a session, creating it if needed"""
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+
+
+class SessionStore(SessionBackend):
+    """In-process session store with an entry cap, idle TTL and LRU eviction.
+
+    Entries live in an OrderedDict kept in least-recently-used order, so a
+    touch is a move_to_end and both LRU eviction and TTL expiry only ever
+    look at the front. Expired entries are dropped lazily on access and on
+    every insert. Only safe with a single worker process.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()  # session id -> (last access, data)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, touched, now):
+        return self.ttl_seconds is not None and now - touched > self.ttl_seconds
+
+    def _sweep(self, now):
+        while self._entries:
+            session_id, (touched, _) = next(iter(self._entries.items()))
+            if not self._expired(touched, now):
+                break
+            del self._entries[session_id]
+            self.expirations += 1
+
+    def get(self, session_id, default=None):
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return default
+            if self._expired(entry[0], now):
+                del self._entries[session_id]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries[session_id] = (now, entry[1])
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry[1]
+
+    def update(self, session_id, fields):
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            data = entry[1] if entry is not None and not self._expired(entry[0], now) else SessionRecord()
+            data.update(fields)
+            self._put(session_id, data, now)
+
+    def _put(self, session_id, data, now):
+        self._entries[session_id] = (now, data)
+        self._entries.move_to_end(session_id)
+        self._sweep(now)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            'backend': 'memory',
+            'size': len(self._entries),
+            'maxEntries': self.max_entries,
+            'ttlSeconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class SQLiteSessionStore(SessionBackend):
+    """Session store in a SQLite database in WAL mode, shared by all workers.
+
+    Each thread (and each forked process) opens its own connection on first
+    use, creating the table if needed. Writes are read-modify-write inside
+    BEGIN IMMEDIATE, so two workers updating the same session serialize
+    instead of losing fields. Read touches are
+    buffered and flushed in one executemany commit, and TTL/LRU housekeeping
+    runs every sweep_every writes rather than on each request. A touch is
+    written at once when the stored one is touch_seconds old, so a session
+    read only by a quiet worker does not expire, or get swept, while in use.
+    """
+
+    SELECT = 'SELECT data, touched FROM sessions WHERE id = ?'
+    UPSERT = ('INSERT INTO sessions (id, data, touched) VALUES (?, ?, ?) '
+              'ON CONFLICT(id) DO UPDATE SET data = excluded.data, touched = excluded.touched')
+    TOUCH = 'UPDATE sessions SET touched = ? WHERE id = ? AND touched < ?'
+    DELETE = 'DELETE FROM sessions WHERE id = ?'
+    EXPIRE = 'DELETE FROM sessions WHERE touched < ?'
+    TRIM = 'DELETE FROM sessions WHERE id IN (SELECT id FROM sessions ORDER BY touched LIMIT ?)'
+    COUNT = 'SELECT COUNT(*) FROM sessions'
+
+    def __init__(self, path, max_entries=100000, ttl_seconds=3600, touch_batch=64, touch_seconds=60,
+                 sweep_every=256, clock=time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.touch_batch = touch_batch
+        self.touch_seconds = touch_seconds
+        self.sweep_every = sweep_every
+        self.clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._touches = {}
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _conn(self):
+        # Opened on first use, so none is opened in the gunicorn master and
+        # inherited across the fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, touched REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS sessions_touched ON sessions (touched)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _expired(self, touched, now):
+        return self.ttl_seconds is not None and now - touched > self.ttl_seconds
+
+    def get(self, session_id, default=None):
+        now = self.clock()
+        row = self._conn().execute(self.SELECT, (session_id,)).fetchone()
+        if row is None or self._expired(max(row[1], self._touches.get(session_id, 0)), now):
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._touch(session_id, now, row[1])
+        return SessionRecord.from_state(json.loads(row[0]))
+
+    def _touch(self, session_id, now, stored):
+        with self._lock:
+            self._touches[session_id] = now
+            if len(self._touches) < self.touch_batch and now - stored < self.touch_seconds:
+                return
+            touches, self._touches = self._touches, {}
+        self._flush(touches)
+
+    def _flush(self, touches):
+        conn = self._conn()
+        conn.execute('BEGIN')
+        try:
+            conn.executemany(self.TOUCH, [(t, sid, t) for sid, t in touches.items()])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def flush(self):
+        """Write buffered read touches now"""
+        with self._lock:
+            touches, self._touches = self._touches, {}
+        if touches:
+            self._flush(touches)
+
+    def update(self, session_id, fields):
+        now = self.clock()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(self.SELECT, (session_id,)).fetchone()
+            fresh = row is not None and not self._expired(row[1], now)
+            data = SessionRecord.from_state(json.loads(row[0])) if fresh else SessionRecord()
+            data.update(fields)
+            conn.execute(self.UPSERT, (session_id, json.dumps(data.state()), now))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+        with self._lock:
+            self._touches.pop(session_id, None)
+            self._writes += 1
+            sweep = self._writes % self.sweep_every == 0
+        if sweep:
+            self.sweep()
+
+    def sweep(self):
+        """Drop expired sessions and trim the table back to max_entries"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if self.ttl_seconds is not None:
+                self.expirations += conn.execute(self.EXPIRE, (self.clock() - self.ttl_seconds,)).rowcount
+            excess = conn.execute(self.COUNT).fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.evictions += conn.execute(self.TRIM, (excess,)).rowcount
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def delete(self, session_id):
+        self._conn().execute(self.DELETE, (session_id,))
+
+    def __len__(self):
+        return self._conn().execute(self.COUNT).fetchone()[0]
+
+    def stats(self):
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'size': len(self),
+            'maxEntries': self.max_entries,
+            'ttlSeconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+def create_session_store(backend='memory', **options):
+    """Build the session backend named by SESSION_BACKEND"""
+    backends = {'memory': SessionStore, 'sqlite': SQLiteSessionStore}
+    if backend not in backends:
+        raise ValueError(f'Unknown session backend {backend!r}, expected one of {sorted(backends)}')
+    return backends[backend](**options)
@@ -0,0 +1,183 @@
+# shared_store.py - Historical store published once in shared memory for every worker
+#
+#   python shared_store.py publish fraud-history --history history.fdhs
+#   python shared_store.py publish fraud-history --log decisions.ndjson   # fold new decisions in
+#   python shared_store.py info fraud-history
+#   python shared_store.py unlink fraud-history
+#
+# A publisher lays the store and its RangeIndex out in a shared memory segment
+# in the store file format, and readers view the columns in place, so N
+# processes hold one copy of the data. A control segment holds the current
+# generation number. Publishing writes generation N+1 into a new segment
+# <name>.<N+1>, then bumps the counter and unlinks generation N. Processes
+# still reading N keep their mapping until they switch, so a reader always
+# sees one whole snapshot. Only one publisher may run at a time.
+#
+# A snapshot's meta records its source (see file_source), so a process that
+# finds a segment left over from a run on other data can tell and republish.
+import argparse
+import json
+import os
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from store import HistoricalStore
+
+
+class Segment(shared_memory.SharedMemory):
+    """A SharedMemory segment whose lifetime the publisher manages.
+
+    Before Python 3.13 every process that attaches registers the segment with
+    the resource tracker, which unlinks it when that process exits and would
+    take the store away from every other worker.
+    """
+
+    def __init__(self, name, create=False, size=0):
+        if sys.version_info >= (3, 13):
+            super().__init__(name, create, size, track=False)
+        else:
+            super().__init__(name, create, size)
+            resource_tracker.unregister(self._name, 'shared_memory')
+
+    def unlink(self):
+        if sys.version_info < (3, 13):
+            # SharedMemory.unlink unregisters the name, which __init__ already did
+            resource_tracker.register(self._name, 'shared_memory')
+        super().unlink()
+
+    def __del__(self):
+        # Columns still held by an in-flight request keep the mapping alive;
+        # it is unmapped when the last of them goes
+        try:
+            self.close()
+        except (OSError, BufferError):
+            pass
+
+
+def _attach(name):
+    try:
+        return Segment(name)
+    except FileNotFoundError:
+        return None
+
+
+def file_source(path):
+    """Identity of a store file, recorded as a snapshot's source"""
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtimeNs': stat.st_mtime_ns}
+
+
+def publish(store, name, meta=None):
+    """Publish store as the next generation of name and return that generation"""
+    control = _attach(name) or Segment(name, create=True, size=8)
+    counter = np.ndarray((1,), dtype=np.uint64, buffer=control.buf)
+    generation = int(counter[0]) + 1
+
+    segment = Segment(f'{name}.{generation}', create=True, size=store.serialized_size(meta))
+    store.write_into(segment.buf, meta)
+    # One aligned 8-byte store: readers see the old generation or the new one
+    counter[0] = generation
+
+    previous = _attach(f'{name}.{generation - 1}')
+    if previous is not None:
+        previous.unlink()
+    del counter
+    return generation
+
+
+def unlink(name):
+    """Remove the current generation and the control segment"""
+    handle = SharedStore(name)
+    generation = handle.generation()
+    for segment_name in (f'{name}.{generation}', name):
+        segment = _attach(segment_name)
+        if segment is not None:
+            segment.unlink()
+
+
+class SharedStore:
+    """A reader's handle on a published store.
+
+    current() costs one read of the generation counter, and attaches to a
+    newer snapshot when one has been published.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._control = None
+        self._counter = None
+        self._generation = 0
+        self._store = None
+        self.switches = 0
+
+    def generation(self):
+        """The latest published generation, 0 if nothing has been published"""
+        if self._counter is None:
+            self._control = _attach(self.name)
+            if self._control is None:
+                return 0
+            self._counter = np.ndarray((1,), dtype=np.uint64, buffer=self._control.buf)
+        return int(self._counter[0])
+
+    def current(self):
+        """The latest published HistoricalStore, or None if nothing has been published"""
+        generation = self.generation()
+        while generation != self._generation:
+            segment = _attach(f'{self.name}.{generation}')
+            if segment is None:
+                # Superseded between reading the counter and attaching
+                generation = self.generation()
+                continue
+            store = HistoricalStore.from_buffer(segment.buf, f'shared memory {segment.name}')
+            store.segment = segment
+            store.path = f'shm:{segment.name}'
+            self._store, self._generation = store, generation
+            self.switches += 1
+        return self._store
+
+    def stats(self):
+        return {'name': self.name, 'generation': self._generation, 'switches': self.switches}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Publish the historical store in shared memory')
+    sub = parser.add_subparsers(dest='command', required=True)
+    pub = sub.add_parser('publish', help='publish a new generation')
+    pub.add_argument('name')
+    pub.add_argument('--history', help='store file to publish (default: the current generation)')
+    pub.add_argument('--log', help='fold this decision log (HISTORY_LOG_PATH) into the new generation')
+    sub.add_parser('info', help='show the current generation').add_argument('name')
+    sub.add_parser('unlink', help='remove the published store').add_argument('name')
+    args = parser.parse_args(argv)
+
+    if args.command == 'unlink':
+        unlink(args.name)
+        return
+    current = SharedStore(args.name).current()
+    if args.command == 'info':
+        if current is None:
+            sys.exit(f'Nothing published as {args.name}')
+        print(json.dumps({**current.stats(), 'generation': SharedStore(args.name).generation(), 'meta': current.meta}))
+        return
+
+    store = HistoricalStore.open(args.history) if args.history else current
+    if store is None:
+        sys.exit(f'Nothing published as {args.name} yet; pass --history')
+    # Folding in a log keeps the snapshot's source; a new file replaces it
+    source = file_source(args.history) if args.history else store.meta.get('source')
+    meta = {'source': source} if source else {}
+    if args.log:
+        from live_history import LiveHistory
+
+        # Rows up to logOffset are already in the store; readers replay the log from there
+        offset = 0 if args.history else store.meta.get('logOffset', 0)
+        live = LiveHistory(store, log_path=args.log, log_offset=offset)
+        store, meta = live.base, {**meta, 'logOffset': live.log_offset}
+    generation = publish(store, args.name, meta)
+    print(f'Published {len(store):,} rows as {args.name} generation {generation}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+# sketches.py - Fixed-memory sketches for velocity over high-cardinality keys
+#
+# Exact per-key counters (velocity.py) grow with the number of keys. These
+# sketches take their memory up front and answer in O(depth x generations)
+# time however many distinct keys they have seen.
+#
+# CountMinSketch   transactions per key. With width w and depth d an estimate
+#                  is never below the true count, and exceeds it by more than
+#                  e/w x N with probability at most e^-d, N being everything
+#                  added in the window. Conservative update (only the lowest
+#                  counters are raised) keeps the excess well under the bound
+#                  in practice.
+# DistinctSketch   distinct values per key: a count-min layout whose cells
+#                  are HyperLogLogs of 2^p registers. A cell estimates the
+#                  distinct values of every key hashed into it, with relative
+#                  standard error 1.04/sqrt(2^p) (small counts use linear
+#                  counting and are close to exact). A key's answer is the
+#                  smallest of its d cells, which on top of that error
+#                  overcounts by the values of keys it collides with in all d
+#                  rows. Size the width on the order of the keys active in
+#                  one window.
+#
+# Both cover a sliding window of `seconds` as `generations` sub-tables that
+# rotate: as time moves on the oldest is cleared, and a query combines the
+# live ones (summed counts, register-wise max), so a window's trailing edge
+# is exact to within one generation.
+import hashlib
+import math
+import threading
+import time
+
+import numpy as np
+
+
+def _hash(value):
+    """Two 64-bit hashes of value, the second odd, for double hashing"""
+    digest = hashlib.blake2b(str(value).encode(), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+
+class _RotatingSketch:
+    """A depth x width table of cells, each holding one slot per generation, that rotates with the clock.
+
+    A key's cell keeps all its generations side by side, so reading a key is
+    one small contiguous view per row.
+    """
+
+    def __init__(self, shape, dtype, width, depth, seconds, generations, clock):
+        self.table = np.zeros((depth, width, generations) + shape, dtype=dtype)
+        self.width = width
+        self.depth = depth
+        self.seconds = seconds
+        self.generations = generations
+        self.generation_seconds = seconds / generations
+        self.clock = clock
+        self._slot = int(clock() // self.generation_seconds)
+        self._lock = threading.Lock()
+        self.rotations = 0
+
+    def _cells(self, key):
+        """Views of key's cell in each row"""
+        h1, h2 = _hash(key)
+        return [self.table[row, (h1 + row * h2) % self.width] for row in range(self.depth)]
+
+    def _rotate(self):
+        """Index of the current generation, after clearing those that slid out of the window"""
+        slot = int(self.clock() // self.generation_seconds)
+        if slot > self._slot:
+            for s in range(self._slot + 1, min(slot, self._slot + self.generations) + 1):
+                self.table[:, :, s % self.generations] = 0
+                self.rotations += 1
+            self._slot = slot
+        return self._slot % self.generations
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+
+class CountMinSketch(_RotatingSketch):
+    """Approximate per-key counts over a sliding window"""
+
+    def __init__(self, width=1 << 18, depth=4, seconds=3600, generations=6, clock=time.monotonic):
+        super().__init__((), np.uint32, width, depth, seconds, generations, clock)
+
+    def add(self, key, count=1):
+        """Count key and return its new estimate"""
+        cells = self._cells(key)
+        with self._lock:
+            g = self._rotate()
+            counters = [cell.tolist() for cell in cells]
+            # Conservative update within the generation, so each generation
+            # on its own never undercounts and neither does their sum
+            target = min(c[g] for c in counters) + count
+            for cell, c in zip(cells, counters):
+                if c[g] < target:
+                    cell[g] = c[g] = target
+        return min(sum(c) for c in counters)
+
+    def estimate(self, key):
+        cells = self._cells(key)
+        with self._lock:
+            self._rotate()
+            return min(sum(cell.tolist()) for cell in cells)
+
+
+# 2^-rank for every possible register value
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(66)]
+
+
+class DistinctSketch(_RotatingSketch):
+    """Approximate distinct values per key over a sliding window"""
+
+    def __init__(self, width=1 << 15, depth=2, precision=5, seconds=3600, generations=4, clock=time.monotonic):
+        self.precision = precision
+        self.registers = m = 1 << precision
+        super().__init__((m,), np.uint8, width, depth, seconds, generations, clock)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        self._alpha_mm = alpha * m * m
+
+    def add(self, key, value):
+        """Add value to key's set and return the new estimate of its size"""
+        cells = self._cells(key)
+        h = _hash(value)[0]
+        register = h & (self.registers - 1)
+        rank = (64 - self.precision) - (h >> self.precision).bit_length() + 1
+        with self._lock:
+            g = self._rotate()
+            for cell in cells:
+                if cell[g, register] < rank:
+                    cell[g, register] = rank
+            return self._estimate(cells)
+
+    def estimate(self, key):
+        cells = self._cells(key)
+        with self._lock:
+            self._rotate()
+            return self._estimate(cells)
+
+    def _estimate(self, cells):
+        """HyperLogLog estimate of each of the key's cells over the live generations; the smallest wins"""
+        m = self.registers
+        estimates = []
+        for cell in cells:
+            merged = cell.max(axis=0).tolist()
+            zeros = merged.count(0)
+            raw = self._alpha_mm / sum([_INVERSE_POWERS[r] for r in merged])
+            estimates.append(m * math.log(m / zeros) if raw <= 2.5 * m and zeros else raw)
+        return round(min(estimates))
+
+
+class VelocitySketches:
+    """Hound's sketch features over one window.
+
+    deviceCount<name>    transactions from the device
+    userDevices<name>    distinct devices the user transacted from
+    userLocations<name>  distinct locations the user transacted from
+    """
+
+    def __init__(self, name='1h', seconds=3600, width=1 << 18, distinct_width=1 << 15, clock=time.monotonic):
+        self.name = name
+        self.feature_names = [f'deviceCount{name}', f'userDevices{name}', f'userLocations{name}']
+        self.device_counts = CountMinSketch(width, seconds=seconds, clock=clock)
+        self.user_devices = DistinctSketch(distinct_width, seconds=seconds, clock=clock)
+        self.user_locations = DistinctSketch(distinct_width, seconds=seconds, clock=clock)
+        self.observed = 0
+
+    def observe(self, user_name, device, location):
+        """Record one transaction and return the features it has keys for"""
+        features = {}
+        if device is not None:
+            features[f'deviceCount{self.name}'] = self.device_counts.add(device)
+        if user_name is not None and device is not None:
+            features[f'userDevices{self.name}'] = self.user_devices.add(user_name, device)
+        if user_name is not None and location is not None:
+            features[f'userLocations{self.name}'] = self.user_locations.add(user_name, location)
+        self.observed += 1
+        return features
+
+    def features(self, user_name, device, location):
+        """The features for a transaction's keys, without recording it"""
+        features = {}
+        if device is not None:
+            features[f'deviceCount{self.name}'] = self.device_counts.estimate(device)
+        if user_name is not None and device is not None:
+            features[f'userDevices{self.name}'] = self.user_devices.estimate(user_name)
+        if user_name is not None and location is not None:
+            features[f'userLocations{self.name}'] = self.user_locations.estimate(user_name)
+        return features
+
+    def stats(self):
+        sketches = {'deviceCount': self.device_counts, 'userDevices': self.user_devices,
+                    'userLocations': self.user_locations}
+        return {
+            'window': self.name,
+            'seconds': self.device_counts.seconds,
+            'observed': self.observed,
+            'bytes': sum(s.nbytes for s in sketches.values()),
+            'sketches': {
+                name: {'width': s.width, 'depth': s.depth, 'generations': s.generations, 'rotations': s.rotations}
+                for name, s in sketches.items()
+            },
+        }
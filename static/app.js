@@ -0,0 +1,270 @@
+// app.js - Federated Intelligence UI: analysis pipeline, agent chat and decisions
+
+const API_URL = window.location.origin;
+let sessionId = 'session-' + Date.now();
+let pipelineResults = null;
+const agentKeys = { agent1: 'hound', agent2: 'fetch', agent3: 'judge' };
+
+async function startAnalysis() {
+    const btn = document.getElementById('startBtn');
+    const spinner = document.getElementById('loadingSpinner');
+    btn.disabled = true;
+    spinner.style.display = 'inline-block';
+
+    const transaction = {
+        userName: document.getElementById('userName').value,
+        transactionAmount: parseFloat(document.getElementById('transactionAmount').value),
+        previousTransactions: parseInt(document.getElementById('previousTransactions').value),
+        accountAge: parseInt(document.getElementById('accountAge').value),
+        location: document.getElementById('location').value,
+        deviceType: document.getElementById('deviceType').value,
+        timeOfDay: document.getElementById('timeOfDay').value
+    };
+
+    // Reset UI
+    document.querySelectorAll('.agent-card').forEach(card => {
+        card.classList.remove('active', 'completed');
+        card.querySelector('.agent-output').classList.remove('show');
+        card.querySelector('.chat-interface').classList.remove('show');
+        card.querySelector('.agent-status').className = 'agent-status status-pending';
+        card.querySelector('.agent-status').textContent = 'Pending';
+    });
+    document.getElementById('finalDecision').classList.remove('show');
+
+    // Run all three agents in a single round trip; cards reveal the results one by one
+    pipelineResults = null;
+    try {
+        const response = await fetch(API_URL + '/api/analyze', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ sessionId, transaction })
+        });
+        if (response.ok) pipelineResults = await response.json();
+    } catch (error) {
+        console.error('Error:', error);
+    }
+
+    // Start analysis
+    setTimeout(async () => {
+        spinner.style.display = 'none';
+        await activateAgent('agent1', transaction);
+    }, 500);
+}
+
+async function activateAgent(agentId, transaction = null) {
+    const card = document.getElementById(agentId);
+    const status = document.getElementById(agentId + '-status');
+
+    card.classList.add('active');
+    status.className = 'agent-status status-active';
+    status.textContent = 'Processing';
+
+    let endpoint = '';
+    if (agentId === 'agent1') endpoint = '/api/analyze/hound';
+    else if (agentId === 'agent2') endpoint = '/api/analyze/fetch';
+    else if (agentId === 'agent3') endpoint = '/api/analyze/judge';
+
+    try {
+        let data = pipelineResults ? pipelineResults[agentKeys[agentId]] : null;
+        if (!data) {
+            const response = await fetch(API_URL + endpoint, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ sessionId, transaction })
+            });
+            data = await response.json();
+        }
+
+        setTimeout(() => {
+            displayAgentOutput(agentId, data);
+            status.className = 'agent-status status-completed';
+            status.textContent = 'Complete';
+            card.querySelector('.chat-interface').classList.add('show');
+
+            if (agentId === 'agent3') {
+                document.getElementById('finalDecision').classList.add('show');
+            }
+        }, 800);
+    } catch (error) {
+        console.error('Error:', error);
+        status.textContent = 'Error';
+    }
+}
+
+function displayAgentOutput(agentId, data) {
+    const output = document.getElementById(agentId + '-output');
+    let html = '';
+
+    if (agentId === 'agent1') {
+        const riskLevel = data.fraudScore > 70 ? 'danger' : data.fraudScore > 40 ? 'warning' : 'success';
+        html = `
+            <div class="metric-card">
+                <div class="metric-label">Fraud Probability Score</div>
+                <div class="metric-value">${data.fraudScore}%</div>
+            </div>
+            <div class="alert alert-${riskLevel}">
+                <div>
+                    <strong>Confidence Level:</strong> ${data.confidence}%<br>
+                    <strong>Risk Factors Identified:</strong>
+                    <ul style="margin: 0.5rem 0 0 1.5rem;">
+                        ${data.factors.map(f => `<li>${f}</li>`).join('')}
+                    </ul>
+                </div>
+            </div>
+        `;
+    } else if (agentId === 'agent2') {
+        html = `
+            <div class="metric-card">
+                <div class="metric-label">Similar Patterns Found</div>
+                <div class="metric-value">${data.similarCount}</div>
+            </div>
+            <div class="metric-card">
+                <div class="metric-label">Historical Fraud Rate</div>
+                <div class="metric-value">${data.fraudRate}%</div>
+            </div>
+            ${data.anomalies && data.anomalies.length > 0 ? `
+                <div class="alert alert-danger">
+                    <div>
+                        <strong>⚠️ Critical Anomalies:</strong><br>
+                        ${data.anomalies.map(a => `• ${a}`).join('<br>')}
+                    </div>
+                </div>
+            ` : '<div class="alert alert-success">✓ Pattern within normal parameters</div>'}
+        `;
+    } else if (agentId === 'agent3') {
+        const alertType = data.finalScore > 70 ? 'danger' : data.finalScore > 50 ? 'warning' : 'success';
+        const icon = data.finalScore > 70 ? '🚨' : data.finalScore > 50 ? '⚠️' : '✅';
+        html = `
+            <div class="alert alert-${alertType}">
+                <div>
+                    <strong style="font-size: 1.25rem;">${icon} ${data.classification}</strong><br>
+                    <div style="margin-top: 0.75rem;">
+                        <strong>Risk Score:</strong> ${data.finalScore}%<br>
+                        <strong>Action:</strong> ${data.recommendation}
+                    </div>
+                </div>
+            </div>
+        `;
+    }
+
+    output.innerHTML = html;
+    output.classList.add('show');
+}
+
+async function sendMessage(agentId) {
+    const input = document.getElementById(agentId + '-input');
+    const message = input.value.trim();
+    if (!message) return;
+
+    const messagesDiv = document.getElementById(agentId + '-messages');
+    messagesDiv.innerHTML += `<div class="chat-message message-user"><strong>You:</strong> ${message}</div>`;
+    input.value = '';
+
+    try {
+        const response = await fetch(API_URL + '/api/chat/' + agentId, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+            body: JSON.stringify({ sessionId, message, stream: true })
+        });
+
+        const bubble = document.createElement('div');
+        bubble.className = 'chat-message message-agent';
+        bubble.innerHTML = '<strong>Agent:</strong> ';
+        const text = document.createElement('span');
+        bubble.appendChild(text);
+        messagesDiv.appendChild(bubble);
+
+        if (!response.ok || !response.body) {
+            const data = await response.json();
+            text.textContent = data.response || data.error;
+            return;
+        }
+
+        // Render tokens as the server-sent events arrive
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+                const frame = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                const event = (frame.match(/^event: (.*)$/m) || [])[1];
+                const payload = (frame.match(/^data: (.*)$/m) || [])[1];
+                if (event === 'token' && payload) text.textContent += JSON.parse(payload).token;
+            }
+            messagesDiv.scrollTop = messagesDiv.scrollHeight;
+        }
+    } catch (error) {
+        messagesDiv.innerHTML += `<div class="chat-message message-agent"><strong>Agent:</strong> Processing your query...</div>`;
+    }
+}
+
+async function nextAgent(currentAgentId) {
+    const card = document.getElementById(currentAgentId);
+    card.classList.remove('active');
+    card.classList.add('completed');
+
+    if (currentAgentId === 'agent1') {
+        await activateAgent('agent2');
+    } else if (currentAgentId === 'agent2') {
+        await activateAgent('agent3');
+    }
+}
+
+async function makeDecision(decision) {
+    await fetch(API_URL + '/api/decision', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ sessionId, decision })
+    });
+
+    const emoji = decision === 'approve' ? '✅' : decision === 'review' ? '🔍' : '🚫';
+    const color = decision === 'approve' ? '#10b981' : decision === 'review' ? '#f59e0b' : '#ef4444';
+
+    // Modern notification
+    const notification = document.createElement('div');
+    notification.style.cssText = `
+        position: fixed;
+        top: 2rem;
+        right: 2rem;
+        background: white;
+        padding: 1.5rem 2rem;
+        border-radius: 12px;
+        box-shadow: 0 20px 25px -5px rgba(0, 0, 0, 0.1);
+        display: flex;
+        align-items: center;
+        gap: 1rem;
+        z-index: 1000;
+        animation: slideInRight 0.4s ease;
+        border-left: 4px solid ${color};
+    `;
+    notification.innerHTML = `
+        <span style="font-size: 2rem;">${emoji}</span>
+        <div>
+            <strong style="font-size: 1.125rem;">Decision Recorded</strong><br>
+            <span style="color: #64748b;">Transaction ${decision}</span>
+        </div>
+    `;
+    document.body.appendChild(notification);
+
+    setTimeout(() => {
+        notification.style.animation = 'slideOutRight 0.4s ease';
+        setTimeout(() => notification.remove(), 400);
+    }, 3000);
+
+    document.getElementById('startBtn').disabled = false;
+}
+
+// Keyboard support
+document.querySelectorAll('.chat-input').forEach(input => {
+    input.addEventListener('keypress', (e) => {
+        if (e.key === 'Enter') {
+            const agentId = input.id.replace('-input', '');
+            sendMessage(agentId);
+        }
+    });
+});
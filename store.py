@@ -0,0 +1,548 @@
+# store.py - Columnar historical transaction store for Agent Fetch
+import json
+import math
+import os
+import time
+import numpy as np
+
+from kdtree import KDTree
+
+# Tiny amount + massive history - the pattern Hound, Fetch and Judge all single out
+TINY_AMOUNT = 100
+MASSIVE_HISTORY = 100000
+
+# On-disk layout: magic, uint32 header length, JSON header, then one
+# 64-byte aligned little-endian array per column
+STORE_MAGIC = b'FDHSTORE'
+STORE_FORMAT_VERSION = 4
+STORE_ALIGN = 64
+STORE_COLUMNS = ('amount', 'previous_transactions', 'account_age', 'fraud_score', 'fraud_bits', 'pattern')
+INDEX_COLUMNS = ('cum_amount', 'cum_prev', 'cum_age', 'cum_fraud', 'cum_pattern',
+                 'grid_shape', 'amount_lo', 'amount_hi', 'prev_lo', 'prev_hi', 'cell_scores', 'grid_rows',
+                 'grid_amount', 'grid_prev', 'grid_age', 'grid_fraud', 'grid_pattern')
+
+# Upper bound on the grid's bins per axis
+GRID_MAX_BINS = 256
+
+
+def bits_at(packed, rows):
+    """Bits at the given row positions of a packed (big-endian) bitmask"""
+    return (packed[rows >> 3] >> (7 - (rows & 7)).astype(np.uint8)) & 1
+
+
+def legitimate_pattern(amount, previous_transactions, is_fraud):
+    """Rows not labelled fraud that show the tiny amount + massive history pattern.
+
+    Fetch flags a transaction with the pattern when no legitimate similar
+    row shows it, so rows labelled fraud must not count.
+    """
+    return (amount < TINY_AMOUNT) & (previous_transactions > MASSIVE_HISTORY) & ~is_fraud
+
+
+def _row_dtype(n):
+    return np.int32 if n < 2**31 else np.int64
+
+
+def _prefix_sum(values, dtype):
+    out = np.zeros(len(values) + 1, dtype=dtype)
+    np.cumsum(values, dtype=dtype, out=out[1:])
+    return out
+
+
+def _bin_starts(sorted_values, bins):
+    """Start positions of up to `bins` equal-count bins over sorted values, plus the end; equal values share a bin"""
+    n = len(sorted_values)
+    if not n:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.searchsorted(sorted_values, sorted_values[np.arange(bins) * n // bins], 'left')
+    return np.append(np.unique(starts), n).astype(np.int64)
+
+
+def _spans(starts, ends):
+    """Positions in the ranges [starts[i], ends[i]), concatenated"""
+    lengths = ends - starts
+    keep = lengths > 0
+    starts, lengths = starts[keep], lengths[keep]
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return np.arange(len(offsets), dtype=np.int64) + offsets
+
+
+class RangeIndex:
+    """Grid index answering Agent Fetch's similarity predicate.
+
+    The store is clustered on fraudScore, so the fraudScore clause is a
+    contiguous row range found with two bisects, and cumulative sums of
+    amount, previousTransactions, accountAge, isFraud and the pattern flag in
+    store order (cum_x[i] is the sum over rows [0, i)) total it with two
+    lookups each.
+
+    The amount / previousTransactions clause is answered on a grid of equal-
+    count bins per axis (about n^(1/3) of them, fewer when the fraudScore span
+    is wide). grid_rows lists the rows cell by cell, fraudScore order within
+    a cell, and cell_scores[cell * span + fraudScore - min] is the grid
+    position where that cell's rows with that fraudScore start, so where the
+    fraudScore range starts and ends in any cell is one lookup each. Prefix
+    sums in grid order (grid_x) then total the rows of a cell that fall
+    outside the fraudScore range. Cells wholly inside the query rectangle are
+    totalled that way; only rows in the cells on its edge, about n^(2/3) of
+    them, are read and checked.
+    """
+
+    def __init__(self, store, arrays, build_seconds=0.0):
+        self.store = store
+        for name in INDEX_COLUMNS:
+            setattr(self, name, arrays[name])
+        self.amount_bins, self.prev_bins, self.score_min, self.score_span = (int(x) for x in self.grid_shape)
+        self.build_seconds = build_seconds
+
+    @classmethod
+    def build(cls, store, bins=None):
+        started = time.perf_counter()
+        n = len(store)
+        if n and np.any(np.diff(store.fraud_score) < 0):
+            raise ValueError('RangeIndex needs a store clustered on fraudScore')
+        score_min = int(store.fraud_score[0]) if n else 0
+        score_span = int(store.fraud_score[-1]) - score_min + 1 if n else 1
+        # cell_scores has bins^2 * span entries; keep it within 2n
+        bins = bins or max(1, min(GRID_MAX_BINS, round(n ** (1 / 3)), math.isqrt(2 * n // score_span)))
+        
+        amount_sorted = np.sort(store.amount)
+        prev_sorted = np.sort(store.previous_transactions)
+        a_starts = _bin_starts(amount_sorted, bins)
+        p_starts = _bin_starts(prev_sorted, bins)
+        amount_lo, amount_hi = amount_sorted[a_starts[:-1]], amount_sorted[a_starts[1:] - 1]
+        prev_lo, prev_hi = prev_sorted[p_starts[:-1]], prev_sorted[p_starts[1:] - 1]
+        amount_bins, prev_bins = len(amount_lo), len(prev_lo)
+        
+        cells = amount_bins * prev_bins
+        cell = (np.searchsorted(amount_lo[1:], store.amount, 'right') * prev_bins
+                + np.searchsorted(prev_lo[1:], store.previous_transactions, 'right'))
+        grid_rows = np.argsort(cell, kind='stable').astype(_row_dtype(n))
+        keys = cell * score_span + (store.fraud_score - score_min)
+        
+        arrays = {
+            'cum_amount': _prefix_sum(store.amount, np.float64),
+            'cum_prev': _prefix_sum(store.previous_transactions, np.int64),
+            'cum_age': _prefix_sum(store.account_age, np.int64),
+            'cum_fraud': _prefix_sum(store.is_fraud, np.int64),
+            'cum_pattern': _prefix_sum(store.pattern, np.int64),
+            'grid_shape': np.array([amount_bins, prev_bins, score_min, score_span], dtype=np.int64),
+            'amount_lo': amount_lo,
+            'amount_hi': amount_hi,
+            'prev_lo': prev_lo,
+            'prev_hi': prev_hi,
+            'cell_scores': _prefix_sum(np.bincount(keys, minlength=cells * score_span), np.int64).astype(_row_dtype(n)),
+            'grid_rows': grid_rows,
+            'grid_amount': _prefix_sum(store.amount[grid_rows], np.float64),
+            'grid_prev': _prefix_sum(store.previous_transactions[grid_rows], np.int64),
+            'grid_age': _prefix_sum(store.account_age[grid_rows], np.int64),
+            'grid_fraud': _prefix_sum(store.is_fraud[grid_rows], np.int64),
+            'grid_pattern': _prefix_sum(store.pattern[grid_rows], np.int64),
+        }
+        return cls(store, arrays, build_seconds=time.perf_counter() - started)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in INDEX_COLUMNS)
+
+    def range_totals(self, lo, hi):
+        """(amount, previousTransactions, accountAge, fraud, pattern) sums over rows [lo, hi)"""
+        return (float(self.cum_amount[hi] - self.cum_amount[lo]),
+                int(self.cum_prev[hi] - self.cum_prev[lo]),
+                int(self.cum_age[hi] - self.cum_age[lo]),
+                int(self.cum_fraud[hi] - self.cum_fraud[lo]),
+                int(self.cum_pattern[hi] - self.cum_pattern[lo]))
+
+    def span_totals(self, starts, ends):
+        """(count, amount, previousTransactions, accountAge, fraud, pattern) sums over grid positions [starts, ends)"""
+        return (int((ends - starts).sum()),
+                float((self.grid_amount[ends] - self.grid_amount[starts]).sum()),
+                int((self.grid_prev[ends] - self.grid_prev[starts]).sum()),
+                int((self.grid_age[ends] - self.grid_age[starts]).sum()),
+                int((self.grid_fraud[ends] - self.grid_fraud[starts]).sum()),
+                int((self.grid_pattern[ends] - self.grid_pattern[starts]).sum()))
+
+    def span_rows(self, starts, ends):
+        """Row ids at grid positions [starts, ends)"""
+        return self.grid_rows[_spans(starts, ends)]
+
+    def _score_bounds(self, fraud_score):
+        # Integer fraudScores s with |s - fraud_score| < 20 are lo..hi
+        info = np.iinfo(self.store.fraud_score.dtype)
+        lo = min(max(math.floor(fraud_score - 20) + 1, info.min), info.max)
+        hi = min(max(math.ceil(fraud_score + 20) - 1, info.min), info.max)
+        return lo, hi
+
+    def score_window(self, fraud_score):
+        """Row range [lo, hi) holding rows with |fraudScore - fraud_score| < 20"""
+        lo, hi = self._score_bounds(fraud_score)
+        scores = self.store.fraud_score
+        # Keys of the column's dtype, or searchsorted converts the whole column
+        lo, hi = scores.dtype.type(lo), scores.dtype.type(hi)
+        return int(np.searchsorted(scores, lo, 'left')), int(np.searchsorted(scores, hi, 'right'))
+
+    @staticmethod
+    def _bins(bin_lo, bin_hi, center):
+        """Bins touching the open interval within 50% of center, as (first, end, inside) over that range.
+
+        A bin is inside when its smallest and largest values both match, and
+        then every value in it does; the others must be checked row by row.
+        """
+        half = center * 0.5
+        lo_ok = np.abs(bin_lo - center) < half
+        hi_ok = np.abs(bin_hi - center) < half
+        touching = np.flatnonzero(lo_ok | hi_ok | ((bin_lo < center) & (bin_hi > center)))
+        if not len(touching):
+            return 0, 0, lo_ok[:0]
+        first, end = int(touching[0]), int(touching[-1]) + 1
+        return first, end, (lo_ok & hi_ok)[first:end]
+
+    def match(self, fraud_score, amount, previous_transactions):
+        """Rows matching the similarity predicate as (lo, hi, starts, ends, extra).
+
+        [lo, hi) is the fraudScore window. Outside it, the grid positions
+        [starts, ends) cover the matching rows of cells wholly inside the
+        amount / previousTransactions rectangle, and extra holds the matching
+        row ids from the cells on its edge.
+        """
+        lo, hi = self.score_window(fraud_score)
+        none = np.zeros(0, dtype=np.int64)
+        if not (amount > 0 and previous_transactions > 0):
+            return lo, hi, none, none, self.grid_rows[:0]
+        
+        a_first, a_end, a_inside = self._bins(self.amount_lo, self.amount_hi, amount)
+        p_first, p_end, p_inside = self._bins(self.prev_lo, self.prev_hi, previous_transactions)
+        if a_first == a_end or p_first == p_end:
+            return lo, hi, none, none, self.grid_rows[:0]
+        cells = (np.arange(a_first, a_end)[:, None] * self.prev_bins + np.arange(p_first, p_end)).ravel()
+        interior = (a_inside[:, None] & p_inside).ravel()
+        
+        # Each cell's rows outside the fraudScore window: [cell start, s0) and [s1, cell end)
+        span = self.score_span
+        base = cells * span
+        cell_start, cell_end = self.cell_scores[base], self.cell_scores[base + span]
+        score_lo, score_hi = self._score_bounds(fraud_score)
+        key_lo, key_hi = max(score_lo - self.score_min, 0), min(score_hi - self.score_min, span - 1)
+        if key_lo > key_hi:
+            s0 = s1 = cell_end
+        else:
+            s0, s1 = self.cell_scores[base + key_lo], self.cell_scores[base + key_hi + 1]
+        starts = np.concatenate([cell_start[interior], s1[interior]])
+        ends = np.concatenate([s0[interior], cell_end[interior]])
+        
+        edge = ~interior
+        candidates = self.span_rows(np.concatenate([cell_start[edge], s1[edge]]),
+                                    np.concatenate([s0[edge], cell_end[edge]]))
+        store = self.store
+        keep = ((np.abs(store.amount[candidates] - amount) < amount * 0.5)
+                & (np.abs(store.previous_transactions[candidates] - previous_transactions) < previous_transactions * 0.5))
+        return lo, hi, starts, ends, candidates[keep]
+
+
+class NeighborIndex:
+    """KD-tree over normalized (amount, previousTransactions, accountAge, fraudScore).
+
+    amount, previousTransactions and accountAge are heavy-tailed, so they are
+    log-scaled first; every feature is then divided by its standard deviation
+    over the store, making one unit of distance one spread of any feature.
+    """
+
+    def __init__(self, store, leaf_size=32):
+        features = self.features(store.amount, store.previous_transactions, store.account_age, store.fraud_score)
+        self.scale = features.std(axis=0) if len(store) else np.ones(features.shape[1])
+        self.scale[self.scale == 0] = 1.0
+        self.tree = KDTree(features / self.scale, leaf_size)
+
+    @staticmethod
+    def features(amount, previous_transactions, account_age, fraud_score):
+        return np.column_stack([
+            np.log1p(np.maximum(np.asarray(amount, dtype=np.float64), 0)),
+            np.log1p(np.maximum(np.asarray(previous_transactions, dtype=np.float64), 0)),
+            np.log1p(np.maximum(np.asarray(account_age, dtype=np.float64), 0)),
+            np.asarray(fraud_score, dtype=np.float64),
+        ])
+
+    @property
+    def build_seconds(self):
+        return self.tree.build_seconds
+
+    @property
+    def nbytes(self):
+        return self.tree.nbytes + self.scale.nbytes
+
+    def point(self, fraud_score, amount, previous_transactions, account_age):
+        """Normalized feature rows for scalars or arrays of the four features"""
+        return self.features(np.atleast_1d(amount), np.atleast_1d(previous_transactions),
+                             np.atleast_1d(account_age), np.atleast_1d(fraud_score)) / self.scale
+
+    def query(self, fraud_score, amount, previous_transactions, account_age, k, max_distance=np.inf):
+        """Row ids and distances of the k nearest rows within max_distance, nearest first"""
+        point = self.point(fraud_score, amount, previous_transactions, account_age)[0]
+        return self.tree.query(point, k, max_distance)
+
+
+class HistoricalStore:
+    """Historical transactions kept as typed column arrays.
+
+    Rows are clustered on fraudScore (row order carries no meaning for the
+    history), which lets RangeIndex answer the fraudScore clause as a
+    contiguous range. isFraud is stored as a packed bitmask (one bit per
+    row); the unpacked boolean view is built lazily for callers that need it.
+    """
+
+    def __init__(self, amount, previous_transactions, account_age, fraud_score, fraud_bits):
+        self.amount = np.asarray(amount, dtype=np.float64)
+        self.previous_transactions = np.asarray(previous_transactions, dtype=np.int64)
+        self.account_age = np.asarray(account_age, dtype=np.int32)
+        self.fraud_score = np.asarray(fraud_score, dtype=np.int16)
+        self.fraud_bits = np.asarray(fraud_bits, dtype=np.uint8)
+        self._is_fraud = None
+        self._pattern = None
+        self._index = None
+        self._neighbors = None
+        self.path = None
+        self.meta = {}
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a store from a list of synthetic_db-style dicts"""
+        return cls.from_columns(
+            [t['transactionAmount'] for t in records],
+            [t['previousTransactions'] for t in records],
+            [t['accountAge'] for t in records],
+            [t['fraudScore'] for t in records],
+            [t['isFraud'] for t in records],
+        )
+
+    @classmethod
+    def from_columns(cls, amount, previous_transactions, account_age, fraud_score, is_fraud):
+        order = np.argsort(np.asarray(fraud_score), kind='stable')
+        return cls(np.asarray(amount)[order], np.asarray(previous_transactions)[order],
+                   np.asarray(account_age)[order], np.asarray(fraud_score)[order],
+                   np.packbits(np.asarray(is_fraud, dtype=bool)[order]))
+
+    def __len__(self):
+        return len(self.amount)
+
+    @property
+    def nbytes(self):
+        return (self.amount.nbytes + self.previous_transactions.nbytes + self.account_age.nbytes
+                + self.fraud_score.nbytes + self.fraud_bits.nbytes)
+
+    @property
+    def is_fraud(self):
+        if self._is_fraud is None:
+            self._is_fraud = np.unpackbits(self.fraud_bits, count=len(self)).astype(bool)
+        return self._is_fraud
+
+    @property
+    def pattern(self):
+        """Legitimate rows showing the tiny amount + massive history pattern"""
+        if self._pattern is None:
+            self._pattern = legitimate_pattern(self.amount, self.previous_transactions, self.is_fraud)
+        return self._pattern
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = RangeIndex.build(self)
+        return self._index
+
+    @property
+    def neighbors(self):
+        if self._neighbors is None:
+            self._neighbors = NeighborIndex(self)
+        return self._neighbors
+
+    def similar_rows(self, fraud_score, amount, previous_transactions):
+        """Row ids Agent Fetch treats as similar to a transaction.
+
+        Similar means fraudScore within 20, or amount and previousTransactions
+        both within 50% of the transaction's values.
+        """
+        index = self.index
+        lo, hi, starts, ends, extra = index.match(fraud_score, amount, previous_transactions)
+        return np.concatenate([np.arange(lo, hi, dtype=extra.dtype), index.span_rows(starts, ends), extra])
+
+    def similar(self, fraud_score, amount, previous_transactions):
+        """Cluster statistics over the rows similar to a transaction"""
+        return cluster_stats(self.similar_totals(fraud_score, amount, previous_transactions))
+
+    def similar_totals(self, fraud_score, amount, previous_transactions):
+        index = self.index
+        lo, hi, starts, ends, extra = index.match(fraud_score, amount, previous_transactions)
+        return add_totals(self.totals(lo, hi, extra), index.span_totals(starts, ends))
+
+    def nearest(self, fraud_score, amount, previous_transactions, account_age, k, max_distance=np.inf):
+        """Cluster statistics over a transaction's k nearest neighbours within max_distance"""
+        return cluster_stats(self.nearest_totals(fraud_score, amount, previous_transactions, account_age, k,
+                                                 max_distance))
+
+    def nearest_totals(self, fraud_score, amount, previous_transactions, account_age, k, max_distance=np.inf):
+        rows, _ = self.neighbors.query(fraud_score, amount, previous_transactions, account_age, k, max_distance)
+        return self.totals(0, 0, rows)
+
+    def aggregate(self, lo, hi, extra):
+        """Cluster statistics over row range [lo, hi) plus the row ids in extra"""
+        return cluster_stats(self.totals(lo, hi, extra))
+
+    def totals(self, lo, hi, extra):
+        """(count, amount, previousTransactions, accountAge, fraud, pattern) sums over [lo, hi) and extra.
+
+        The range comes from the index's prefix sums; only the extra rows
+        are read individually.
+        """
+        amount, prev, age, fraud, pattern = self.index.range_totals(lo, hi) if hi > lo else (0.0, 0, 0, 0, 0)
+        return (hi - lo + len(extra),
+                amount + float(self.amount[extra].sum()),
+                prev + int(self.previous_transactions[extra].sum()),
+                age + int(self.account_age[extra].sum(dtype=np.int64)),
+                fraud + int(bits_at(self.fraud_bits, extra).sum(dtype=np.int64)),
+                pattern + int(self.pattern[extra].sum()))
+
+    def stats(self):
+        index = self.index
+        stats = {
+            'rows': len(self),
+            'bytes': self.nbytes,
+            'indexBytes': index.nbytes,
+            'indexBuildMs': round(index.build_seconds * 1000, 3),
+            'indexGrid': [index.amount_bins, index.prev_bins],
+            'path': self.path,
+        }
+        if self._neighbors is not None:
+            stats['neighborIndexBytes'] = self._neighbors.nbytes
+            stats['neighborIndexBuildMs'] = round(self._neighbors.build_seconds * 1000, 3)
+        return stats
+
+    def _layout(self, meta=None):
+        """Arrays, column table and header of the store format; arrays are little-endian"""
+        index = self.index
+        arrays = [(name, getattr(self, name)) for name in STORE_COLUMNS]
+        arrays += [('index.' + name, getattr(index, name)) for name in INDEX_COLUMNS]
+        arrays = [(name, np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))) for name, array in arrays]
+        
+        columns, offset = [], 0
+        for name, array in arrays:
+            columns.append({'name': name, 'dtype': array.dtype.str, 'offset': offset, 'length': len(array)})
+            offset += _align(array.nbytes)
+        header = {'version': STORE_FORMAT_VERSION, 'rows': len(self), 'columns': columns}
+        if meta:
+            header['meta'] = meta
+        header = json.dumps(header).encode()
+        data_start = _align(len(STORE_MAGIC) + 4 + len(header))
+        return arrays, columns, header, data_start, data_start + offset
+
+    def serialized_size(self, meta=None):
+        """Bytes save() or write_into() would write"""
+        return self._layout(meta)[4]
+
+    def save(self, path, meta=None):
+        """Write the store and its index to a versioned columnar file.
+
+        The file is written next to path and renamed into place, so readers
+        never see a partial store.
+        """
+        arrays, columns, header, data_start, _ = self._layout(meta)
+        
+        tmp_path = f'{path}.tmp-{os.getpid()}'
+        with open(tmp_path, 'wb') as f:
+            f.write(STORE_MAGIC)
+            f.write(np.uint32(len(header)).astype('<u4').tobytes())
+            f.write(header)
+            f.write(b'\0' * (data_start - f.tell()))
+            for name, array in arrays:
+                data = array.tobytes()
+                f.write(data)
+                f.write(b'\0' * (_align(len(data)) - len(data)))
+        os.replace(tmp_path, path)
+
+    def write_into(self, buffer, meta=None):
+        """Lay the store out in the file format inside a writable buffer of serialized_size() bytes"""
+        arrays, columns, header, data_start, size = self._layout(meta)
+        out = np.frombuffer(buffer, dtype=np.uint8, count=size)
+        out[:len(STORE_MAGIC)] = np.frombuffer(STORE_MAGIC, dtype=np.uint8)
+        out[len(STORE_MAGIC):len(STORE_MAGIC) + 4] = np.frombuffer(np.uint32(len(header)).astype('<u4').tobytes(),
+                                                                   dtype=np.uint8)
+        out[len(STORE_MAGIC) + 4:len(STORE_MAGIC) + 4 + len(header)] = np.frombuffer(header, dtype=np.uint8)
+        for (name, array), column in zip(arrays, columns):
+            start = data_start + column['offset']
+            out[start:start + array.nbytes] = array.view(np.uint8)
+
+    @classmethod
+    def open(cls, path):
+        """Open a store file with mmap.
+
+        Only the header is parsed; every column, including the prebuilt
+        index, is a read-only view into the mapping, so opening costs the
+        same at any size and the pages are shared through the OS page cache.
+        """
+        store = cls.from_buffer(np.memmap(path, dtype=np.uint8, mode='r'), os.fspath(path))
+        store.path = os.fspath(path)
+        return store
+
+    @classmethod
+    def from_buffer(cls, mapped, source='buffer'):
+        """Store whose columns and index are views into a uint8 array in the file format"""
+        if not isinstance(mapped, np.ndarray):
+            mapped = np.frombuffer(mapped, dtype=np.uint8)
+        if bytes(mapped[:len(STORE_MAGIC)]) != STORE_MAGIC:
+            raise ValueError(f'{source} is not a historical store')
+        header_len = int(mapped[len(STORE_MAGIC):len(STORE_MAGIC) + 4].view('<u4')[0])
+        header_start = len(STORE_MAGIC) + 4
+        header = json.loads(bytes(mapped[header_start:header_start + header_len]))
+        if header['version'] != STORE_FORMAT_VERSION:
+            raise ValueError(f'{source} has store format version {header["version"]}, expected '
+                             f'{STORE_FORMAT_VERSION}; rewrite it with HistoricalStore.save')
+        
+        data_start = _align(header_start + header_len)
+        arrays = {}
+        for column in header['columns']:
+            dtype = np.dtype(column['dtype'])
+            start = data_start + column['offset']
+            arrays[column['name']] = mapped[start:start + column['length'] * dtype.itemsize].view(dtype)
+        
+        store = cls(*(arrays[name] for name in STORE_COLUMNS[:5]))
+        store._pattern = arrays['pattern']
+        store._index = RangeIndex(store, {name: arrays['index.' + name] for name in INDEX_COLUMNS})
+        store.meta = header.get('meta', {})
+        return store
+
+
+def cluster_stats(totals):
+    """Fetch's cluster dict from a (count, amount, prev, age, fraud, pattern) totals tuple"""
+    count, amount, prev, age, fraud, pattern = totals
+    if not count:
+        return {'count': 0, 'fraudCount': 0}
+    return {
+        'count': count,
+        'avgAmount': amount / count,
+        'avgPrev': prev / count,
+        'avgAge': age / count,
+        'fraudCount': fraud,
+        'patternFound': pattern > 0,
+    }
+
+
+def add_totals(a, b):
+    return tuple(x + y for x, y in zip(a, b))
+
+
+def _align(n):
+    return -(-n // STORE_ALIGN) * STORE_ALIGN
+
+
+if __name__ == '__main__':
+    import sys
+    
+    # python store.py <records.json|records.ndjson> <out.fdhs>
+    if len(sys.argv) != 3:
+        sys.exit('usage: python store.py <records.json|records.ndjson> <out.fdhs>')
+    with open(sys.argv[1]) as f:
+        text = f.read()
+    if text.lstrip().startswith('['):
+        records = json.loads(text)
+    else:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    HistoricalStore.from_records(records).save(sys.argv[2])
+    print(f'Wrote {len(records):,} rows to {sys.argv[2]}')
@@ -0,0 +1,110 @@
+# synthetic.py - Seeded synthetic transaction history for the app, benchmarks and load tests
+#
+#   python synthetic.py history.fdhs --rows 10000000 --seed 7 --fraud-ratio 0.2 --pattern-ratio 0.001
+#
+# Legitimate and fraudulent rows follow the original demo distributions
+# (uniform integers, inclusive bounds):
+#
+#                          legitimate   fraud
+#   transactionAmount      10-5000      10-50000
+#   previousTransactions   1-500        1-50
+#   accountAge             30-1000      1-30
+#   fraudScore             0-100        0-100
+#
+# pattern_ratio of the rows are instead the tiny amount + massive history
+# pattern and are labelled fraud. The same arguments always produce the same
+# rows, whatever the chunk size.
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from store import MASSIVE_HISTORY, TINY_AMOUNT, HistoricalStore
+
+DEFAULT_FRAUD_RATIO = 0.2
+BLOCK_ROWS = 1 << 20  # rows per random stream; fixed so output does not depend on chunk_rows
+PATTERN_MAX_HISTORY = 5_000_000
+
+
+def generate_block(n, rng, fraud_ratio=DEFAULT_FRAUD_RATIO, pattern_ratio=0.0):
+    """Columns for n rows drawn from rng"""
+    is_fraud = rng.random(n) < fraud_ratio
+    columns = {
+        'amount': np.where(is_fraud, rng.integers(10, 50001, n), rng.integers(10, 5001, n)).astype(np.float64),
+        'previous_transactions': np.where(is_fraud, rng.integers(1, 51, n), rng.integers(1, 501, n)),
+        'account_age': np.where(is_fraud, rng.integers(1, 31, n), rng.integers(30, 1001, n)).astype(np.int32),
+        'fraud_score': rng.integers(0, 101, n).astype(np.int16),
+    }
+    if pattern_ratio:
+        pattern = rng.random(n) < pattern_ratio
+        k = int(pattern.sum())
+        columns['amount'][pattern] = rng.integers(1, TINY_AMOUNT, k)
+        columns['previous_transactions'][pattern] = rng.integers(MASSIVE_HISTORY + 1, PATTERN_MAX_HISTORY + 1, k)
+        is_fraud |= pattern
+    columns['is_fraud'] = is_fraud
+    return columns
+
+
+def generate_chunks(n, seed=0, fraud_ratio=DEFAULT_FRAUD_RATIO, pattern_ratio=0.0, chunk_rows=BLOCK_ROWS):
+    """Yield n rows as dicts of column arrays of at most chunk_rows rows each"""
+    streams = np.random.SeedSequence(seed).spawn(-(-n // BLOCK_ROWS))
+    pending, buffered = [], 0
+    for i, stream in enumerate(streams):
+        rows = min(BLOCK_ROWS, n - i * BLOCK_ROWS)
+        pending.append(generate_block(rows, np.random.default_rng(stream), fraud_ratio, pattern_ratio))
+        buffered += rows
+        while buffered >= chunk_rows or (i == len(streams) - 1 and buffered):
+            block = {name: np.concatenate([p[name] for p in pending]) for name in pending[0]}
+            take = min(chunk_rows, buffered)
+            yield {name: column[:take] for name, column in block.items()}
+            pending = [{name: column[take:] for name, column in block.items()}]
+            buffered -= take
+
+
+def synthetic_store(n, seed=0, fraud_ratio=DEFAULT_FRAUD_RATIO, pattern_ratio=0.0):
+    """HistoricalStore of n synthetic rows, clustered on fraudScore and indexed"""
+    columns = {
+        'amount': np.empty(n, dtype=np.float64),
+        'previous_transactions': np.empty(n, dtype=np.int64),
+        'account_age': np.empty(n, dtype=np.int32),
+        'fraud_score': np.empty(n, dtype=np.int16),
+        'is_fraud': np.empty(n, dtype=bool),
+    }
+    start = 0
+    for chunk in generate_chunks(n, seed, fraud_ratio, pattern_ratio):
+        end = start + len(chunk['amount'])
+        for name, column in columns.items():
+            column[start:end] = chunk[name]
+        start = end
+
+    # One column at a time, so at most one extra column is alive during the reorder
+    order = np.argsort(columns['fraud_score'], kind='stable')
+    for name in columns:
+        columns[name] = columns[name][order]
+    del order
+    store = HistoricalStore(columns['amount'], columns['previous_transactions'], columns['account_age'],
+                            columns['fraud_score'], np.packbits(columns['is_fraud']))
+    store._is_fraud = columns['is_fraud']
+    store.index
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a seeded synthetic historical store file')
+    parser.add_argument('output', help='store file to write (open it with HISTORY_PATH)')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fraud-ratio', type=float, default=DEFAULT_FRAUD_RATIO)
+    parser.add_argument('--pattern-ratio', type=float, default=0.0,
+                        help='share of rows with the tiny amount + massive history pattern')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    store = synthetic_store(args.rows, args.seed, args.fraud_ratio, args.pattern_ratio)
+    store.save(args.output)
+    print(f'Wrote {len(store):,} rows to {args.output} in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+# test_bulk_score.py - Offline scoring keeps going past rows it cannot score
+import csv
+
+import bulk_score
+
+
+def test_unscoreable_rows_are_reported_and_the_rest_scored(tmp_path):
+    src = tmp_path / 'in.csv'
+    dst = tmp_path / 'out.csv'
+    src.write_text('userId,transactionAmount,previousTransactions,accountAge\n'
+                   'b,,10,100\n'
+                   'a,50,3,20\n'
+                   'c,abc,1,1\n'
+                   'd,70.5,2,9\n')
+    assert bulk_score.score_file(str(src), str(dst), workers=2, chunk_size=2, log=None) == 4
+    with open(dst, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['userId'] for row in rows] == ['b', 'a', 'c', 'd']
+    assert 'transactionAmount' in rows[0]['error'] and rows[0]['classification'] == ''
+    assert 'transactionAmount' in rows[2]['error']
+    for row in (rows[1], rows[3]):
+        assert row['error'] == '' and row['classification']
+
+
+def test_failing_batch_is_retried_row_by_row(monkeypatch):
+    run = bulk_score.app.run_pipeline_batch
+
+    def fail_on_marked(transactions):
+        if any(t.get('boom') for t in transactions):
+            raise KeyError('boom')
+        return run(transactions)
+
+    monkeypatch.setattr(bulk_score.app, 'run_pipeline_batch', fail_on_marked)
+    row = {'transactionAmount': 40, 'previousTransactions': 5, 'accountAge': 3}
+    scored = bulk_score.score_chunk([row, {**row, 'boom': True}, row])
+    assert 'error' not in scored[0] and 'error' not in scored[2]
+    assert scored[1]['error'] == "KeyError: 'boom'"
@@ -0,0 +1,141 @@
+# test_fetch_equivalence.py - Agent Fetch on the columnar store against the original list-of-dicts loop
+import random
+
+import numpy as np
+import pytest
+
+import app
+from store import HistoricalStore
+from synthetic import synthetic_store
+
+
+def generate_records(rng, n=2000, pattern_fraud_ratio=0.0):
+    """The original generate_synthetic_data rows, plus tiny amount + massive history rows.
+
+    pattern_fraud_ratio of those pattern rows are labelled fraud. The
+    original loop let such rows suppress the CRITICAL flag; Fetch no longer
+    does, so comparisons with reference_fetch keep them all legitimate.
+    """
+    records = []
+    for _ in range(n):
+        is_fraud = rng.random() > 0.8
+        records.append({
+            'transactionAmount': rng.randint(10, 50000) if is_fraud else rng.randint(10, 5000),
+            'previousTransactions': rng.randint(1, 50) if is_fraud else rng.randint(1, 500),
+            'accountAge': rng.randint(1, 30) if is_fraud else rng.randint(30, 1000),
+            'fraudScore': rng.randint(0, 100),
+            'isFraud': is_fraud
+        })
+    for _ in range(n // 100):
+        records.append({
+            'transactionAmount': rng.randint(1, 99),
+            'previousTransactions': rng.randint(100001, 5000000),
+            'accountAge': rng.randint(1, 1000),
+            'fraudScore': rng.randint(0, 100),
+            'isFraud': rng.random() < pattern_fraud_ratio
+        })
+    return records
+
+
+def reference_fetch(records, fraud_score, transaction):
+    """The original analyze_fetch loop"""
+    similar = []
+    for t in records:
+        score_similar = abs(t['fraudScore'] - fraud_score) < 20
+        amount_similar = abs(t['transactionAmount'] - transaction['transactionAmount']) < transaction['transactionAmount'] * 0.5 if transaction['transactionAmount'] > 0 else False
+        prev_trans_similar = abs(t['previousTransactions'] - transaction['previousTransactions']) < transaction['previousTransactions'] * 0.5 if transaction['previousTransactions'] > 0 else False
+        if score_similar or (amount_similar and prev_trans_similar):
+            similar.append(t)
+
+    anomalies = []
+    if similar:
+        avg_amount = sum(t['transactionAmount'] for t in similar) / len(similar)
+        avg_prev = sum(t['previousTransactions'] for t in similar) / len(similar)
+        avg_age = sum(t['accountAge'] for t in similar) / len(similar)
+        if abs(transaction['transactionAmount'] - avg_amount) > avg_amount * 2:
+            anomalies.append(f'Transaction Amount (${transaction["transactionAmount"]} vs cluster avg ${avg_amount:.2f})')
+        if abs(transaction['previousTransactions'] - avg_prev) > avg_prev * 2:
+            anomalies.append(f'Previous Transactions ({transaction["previousTransactions"]:,} vs cluster avg {avg_prev:.0f})')
+        if abs(transaction['accountAge'] - avg_age) > avg_age * 2:
+            anomalies.append(f'Account Age ({transaction["accountAge"]} days vs cluster avg {avg_age:.0f} days)')
+        if transaction['transactionAmount'] < 100 and transaction['previousTransactions'] > 100000:
+            if not any(t['transactionAmount'] < 100 and t['previousTransactions'] > 100000 for t in similar):
+                anomalies.append('CRITICAL: No legitimate user shows this tiny amount + massive history pattern')
+
+    fraud_count = sum(1 for t in similar if t['isFraud'])
+    fraud_rate = (fraud_count / len(similar) * 100) if similar else 0
+    return {'similarCount': len(similar), 'fraudRate': round(fraud_rate), 'anomalies': anomalies}
+
+
+def random_transaction(rng):
+    return {
+        'userName': 'analyst',
+        'transactionAmount': rng.choice([rng.randint(0, 60000), rng.uniform(0, 200), 40, 0, 50000]),
+        'previousTransactions': rng.choice([rng.randint(0, 600), rng.randint(0, 5000000), 0, 3000000, 2000]),
+        'accountAge': rng.choice([rng.randint(0, 2000), 0, 5]),
+        'timeOfDay': rng.choice(['night', 'day']),
+    }
+
+
+@pytest.fixture
+def records(monkeypatch):
+    records = generate_records(random.Random(7))
+    monkeypatch.setattr(app, 'historical_store', HistoricalStore.from_records(records))
+    return records
+
+
+def test_fetch_matches_reference(records):
+    rng = random.Random(11)
+    for _ in range(3000):
+        transaction = random_transaction(rng)
+        fraud_score = app.analyze_hound(transaction).fraud_score + rng.randint(-60, 0)
+        result = app.analyze_fetch(fraud_score, transaction).to_dict()
+        result.pop('timestamp')
+        assert result == reference_fetch(records, fraud_score, transaction), transaction
+
+
+def test_fraud_pattern_rows_do_not_suppress_critical_flag(monkeypatch):
+    """The one intended departure from the original loop: the pattern check counts only legitimate rows"""
+    rng = random.Random(17)
+    records = generate_records(rng, pattern_fraud_ratio=1.0)
+    monkeypatch.setattr(app, 'historical_store', HistoricalStore.from_records(records))
+    critical = 'CRITICAL: No legitimate user shows this tiny amount + massive history pattern'
+    transaction = {'userName': 'analyst', 'transactionAmount': 40, 'previousTransactions': 3000000,
+                   'accountAge': 365, 'timeOfDay': 'night'}
+    for fraud_score in range(0, 101, 5):
+        # Every similar pattern row is fraud: the original loop found one and stayed quiet
+        assert critical not in reference_fetch(records, fraud_score, transaction)['anomalies']
+        assert critical in app.analyze_fetch(fraud_score, transaction).anomalies
+        batch = app.run_pipeline_batch([transaction])[0]
+        assert critical in batch['fetch']['anomalies']
+
+
+def test_batch_matches_single(records):
+    rng = random.Random(13)
+    transactions = [random_transaction(rng) for _ in range(3000)]
+    batch = app.run_pipeline_batch(transactions)
+    for row, transaction in zip(batch, transactions):
+        single = app.render_pipeline(app.run_pipeline(transaction))
+        for agent in ('hound', 'fetch', 'judge'):
+            row[agent].pop('timestamp', None)
+            single[agent].pop('timestamp', None)
+            assert row[agent] == single[agent], transaction
+
+
+def test_index_matches_scan():
+    store = synthetic_store(20000, seed=3, pattern_ratio=0.01)
+    rng = np.random.default_rng(5)
+    for _ in range(500):
+        i = rng.integers(len(store))
+        fraud_score = int(store.fraud_score[i]) + int(rng.integers(-25, 25))
+        amount = float(store.amount[i]) * float(rng.choice([0.5, 1, 1.5, 2]))
+        prev = int(store.previous_transactions[i]) * int(rng.choice([1, 2]))
+        mask = (np.abs(store.fraud_score - fraud_score) < 20) | (
+            (np.abs(store.amount - amount) < amount * 0.5) & (np.abs(store.previous_transactions - prev) < prev * 0.5))
+        rows = np.flatnonzero(mask)
+        count, amount_sum, prev_sum, age_sum, fraud, pattern = store.similar_totals(fraud_score, amount, prev)
+        assert (count, prev_sum, age_sum, fraud, pattern) == (
+            len(rows), int(store.previous_transactions[rows].sum()), int(store.account_age[rows].sum()),
+            int(store.is_fraud[rows].sum()), int(store.pattern[rows].sum()))
+        assert amount_sum == pytest.approx(float(store.amount[rows].sum()))
+        assert np.array_equal(np.sort(store.similar_rows(fraud_score, amount, prev)), rows)
@@ -0,0 +1,116 @@
+# test_hound_rules.py - Hound's default rule set against the original if/elif chain
+import random
+
+import app
+from rules import RuleWatcher, load_rules
+
+
+def reference_hound(transaction):
+    """The original analyze_hound"""
+    fraud_score = 30
+    factors = []
+    if transaction['transactionAmount'] > 10000:
+        fraud_score += 20
+        factors.append('High transaction amount')
+    if transaction['transactionAmount'] < 100 and transaction['previousTransactions'] > 100000:
+        fraud_score += 45
+        factors.append('ANOMALY: Tiny amount with massive transaction history')
+    elif transaction['previousTransactions'] > 10000:
+        fraud_score += 25
+        factors.append('Very high transaction frequency')
+    elif transaction['previousTransactions'] > 1000:
+        fraud_score += 15
+        factors.append('High transaction frequency')
+    if transaction['accountAge'] < 30:
+        fraud_score += 15
+        factors.append('New account (<30 days)')
+    if transaction.get('timeOfDay') == 'night':
+        fraud_score += 10
+        factors.append('Unusual time (night)')
+    fraud_score = min(max(fraud_score, 0), 100)
+    return {'fraudScore': fraud_score, 'confidence': min(90, 50 + len(factors) * 5), 'factors': factors}
+
+
+def random_transactions(n, seed):
+    rng = random.Random(seed)
+    transactions = []
+    for _ in range(n):
+        transaction = {
+            'transactionAmount': rng.choice([40, 99.5, 100, 10000, 10000.5, rng.randint(0, 90000), rng.uniform(0, 200)]),
+            'previousTransactions': rng.choice([100000, 100001, 10000, 10001, 1000, 1001, rng.randint(0, 5000000)]),
+            'accountAge': rng.choice([29, 30, rng.randint(0, 900)]),
+        }
+        time_of_day = rng.choice(['night', 'day', None])
+        if time_of_day:
+            transaction['timeOfDay'] = time_of_day
+        transactions.append(transaction)
+    return transactions
+
+
+def test_single_matches_reference():
+    for transaction in random_transactions(20000, seed=5):
+        result = app.analyze_hound(transaction).to_dict()
+        result.pop('timestamp')
+        assert result == reference_hound(transaction), transaction
+
+
+def test_batch_matches_reference():
+    transactions = random_transactions(20000, seed=6)
+    for row, transaction in zip(app.run_pipeline_batch(transactions), transactions):
+        assert {k: row['hound'][k] for k in ('fraudScore', 'confidence', 'factors')} == reference_hound(transaction)
+
+
+VALID_ROW = {'transactionAmount': 40, 'previousTransactions': 5, 'accountAge': 3}
+
+
+def test_batch_rejects_rows_that_are_not_objects():
+    client = app.app.test_client()
+    for row in (None, 5, 'x', [1]):
+        response = client.post('/api/analyze/batch', json=[VALID_ROW, row])
+        assert response.status_code == 400
+        assert 'row 1' in response.get_json()['error']
+
+
+def test_batch_rejects_rows_with_missing_or_non_numeric_fields():
+    client = app.app.test_client()
+    for field in app.REQUIRED_NUMBERS:
+        for value in (None, '5', True):
+            response = client.post('/api/analyze/batch', json=[VALID_ROW, {**VALID_ROW, field: value}])
+            assert response.status_code == 400
+            assert f'row 1 {field}' in response.get_json()['error']
+        row = dict(VALID_ROW)
+        del row[field]
+        response = client.post('/api/analyze/batch', json=[row])
+        assert response.status_code == 400
+        assert f'row 0 {field}' in response.get_json()['error']
+    assert client.post('/api/analyze/batch', json=[VALID_ROW, {**VALID_ROW, 'transactionAmount': 4.5}]).status_code == 200
+
+
+def test_velocity_features_are_read_only_when_rules_use_them(monkeypatch):
+    calls = []
+    monkeypatch.setattr(app.velocity, 'features', lambda user_name: calls.append('windows') or {})
+    monkeypatch.setattr(app.velocity_sketches, 'features', lambda *keys: calls.append('sketches') or {})
+    transaction = {**VALID_ROW, 'userName': 'ana', 'deviceType': 'mobile', 'location': 'Lima'}
+
+    app.analyze_hound(transaction)
+    app.run_pipeline_batch([transaction, transaction])
+    assert calls == []
+
+    velocity_rules = load_rules(app.HOUND_RULES_PATH.replace('hound_rules.json', 'hound_rules.velocity.json'))
+    monkeypatch.setattr(app.hound_rules, 'current', lambda: velocity_rules)
+    app.analyze_hound(transaction)
+    app.run_pipeline_batch([transaction, transaction])
+    assert calls.count('windows') == 3
+    assert calls.count('sketches') == 3
+
+
+def test_missing_rules_file_keeps_rules(tmp_path):
+    path = tmp_path / 'rules.json'
+    with open(app.HOUND_RULES_PATH) as f:
+        path.write_text(f.read())
+    watcher = RuleWatcher(str(path))
+    rules = watcher.current()
+    path.unlink()
+    assert watcher.reload() is False
+    assert watcher.last_error
+    assert watcher.current() is rules
@@ -0,0 +1,221 @@
+# test_live_history.py - Labelled decisions in the delta, compaction, and workers sharing a log
+import fcntl
+import os
+import threading
+import uuid
+
+import numpy as np
+import pytest
+
+from live_history import LiveHistory
+from shared_store import SharedStore, publish, unlink
+from store import HistoricalStore, legitimate_pattern
+from synthetic import synthetic_store
+
+SOURCE = {'syntheticRows': 5000, 'syntheticSeed': 1}
+
+
+def base_store():
+    return synthetic_store(5000, seed=1, pattern_ratio=0.01)
+
+
+def append_rows(live, rng, n):
+    for _ in range(n):
+        pattern = rng.random() < 0.1
+        live.append(float(rng.uniform(1, 99)) if pattern else float(rng.uniform(10, 5000)),
+                    int(rng.integers(100001, 5000000)) if pattern else int(rng.integers(1, 500)),
+                    int(rng.integers(1, 1000)), int(rng.integers(0, 101)), bool(rng.random() < 0.3))
+
+
+def scan_totals(live, fraud_score, amount, prev):
+    """Fetch's similarity rule over every base and delta row"""
+    columns = [np.concatenate([old, new]) for old, new in zip(
+        (live.base.amount, live.base.previous_transactions, live.base.account_age, live.base.fraud_score,
+         live.base.is_fraud),
+        live.delta.columns())]
+    amounts, prevs, ages, scores, is_fraud = columns
+    rows = (np.abs(scores - fraud_score) < 20) | (
+        (np.abs(amounts - amount) < amount * 0.5) & (np.abs(prevs - prev) < prev * 0.5))
+    return (int(rows.sum()), int(prevs[rows].sum()), int(ages[rows].sum()), int(is_fraud[rows].sum()),
+            int(legitimate_pattern(amounts[rows], prevs[rows], is_fraud[rows]).sum()))
+
+
+def assert_matches_scan(live, rng, queries=300):
+    for _ in range(queries):
+        fraud_score = int(rng.integers(-10, 110))
+        amount = float(rng.choice([rng.uniform(1, 99), rng.uniform(10, 5000), 40.0]))
+        prev = int(rng.choice([rng.integers(1, 500), rng.integers(100001, 5000000)]))
+        count, _, prev_sum, age_sum, fraud, pattern = live.similar_totals(fraud_score, amount, prev)
+        assert (count, prev_sum, age_sum, fraud, pattern) == scan_totals(live, fraud_score, amount, prev)
+
+
+def assert_same_totals(totals, expected):
+    # Amount sums differ in the last bits with the order rows are added in
+    assert totals[:1] + totals[2:] == expected[:1] + expected[2:]
+    assert totals[1] == pytest.approx(expected[1])
+
+
+def test_delta_matches_scan():
+    rng = np.random.default_rng(1)
+    live = LiveHistory(base_store(), compact_rows=10**9, compact_interval=3600)
+    append_rows(live, rng, 3000)
+    assert len(live.delta) == 3000
+    assert_matches_scan(live, rng)
+
+
+def test_compaction_without_log_folds_delta_into_base():
+    rng = np.random.default_rng(2)
+    live = LiveHistory(base_store(), compact_rows=10**9, compact_interval=3600)
+    append_rows(live, rng, 500)
+    before = live.similar_totals(50, 40.0, 3000000)
+    assert live.compact(when_due=True) == 0  # neither enough rows nor old enough
+    assert live.compact() == 500
+    assert (len(live.base), len(live.delta)) == (5500, 0)
+    assert_same_totals(live.similar_totals(50, 40.0, 3000000), before)
+    assert_matches_scan(live, rng)
+
+
+def test_mapped_base_without_log_is_capped_not_copied(tmp_path):
+    base_store().save(tmp_path / 'history.fdhs')
+    base = HistoricalStore.open(tmp_path / 'history.fdhs')
+    live = LiveHistory(base, compact_rows=100, compact_interval=0)
+    append_rows(live, np.random.default_rng(3), 1000)
+    assert live.compact() == 0
+    assert live.base is base
+    assert len(live.delta) <= 100
+    assert live.stats()['droppedRows'] == 1000 - len(live.delta)
+
+
+def log_history(base, tmp_path, **kwargs):
+    log = str(tmp_path / 'decisions.ndjson')
+    return LiveHistory(base, log_path=log, compact_rows=10**9, compact_interval=3600, poll_interval=0,
+                       compact_path=f'{log}.fdhs', source=SOURCE, **kwargs)
+
+
+def test_log_compaction_is_shared_through_the_compacted_file(tmp_path):
+    base = base_store()
+    a, b = log_history(base, tmp_path), log_history(base, tmp_path)
+    rng = np.random.default_rng(4)
+    append_rows(a, rng, 300)
+    b.poll(force=True)
+    assert len(b.delta) == 300
+
+    # Only the process holding the lock compacts
+    fd = os.open(f'{a.log_path}.lock', os.O_RDWR)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        assert a.compact() == 0
+    finally:
+        os.close(fd)
+    assert a.compact() == 300
+
+    b.poll(force=True)
+    for live in (a, b):
+        assert live.base.path == a.compact_path
+        assert (len(live.base), len(live.delta)) == (5300, 0)
+    assert a.base.meta['logOffset'] == os.path.getsize(a.log_path)
+    assert_matches_scan(b, rng, queries=100)
+
+
+def test_two_processes_converge_on_the_compacted_file(tmp_path):
+    base = base_store()
+    a, b = log_history(base, tmp_path), log_history(base, tmp_path)
+    append_rows(a, np.random.default_rng(5), 200)
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            append_rows(b, np.random.default_rng(6), 100)
+            code = 0 if b.compact() == 300 else 2
+        finally:
+            os._exit(code)
+    assert os.waitpid(pid, 0)[1] == 0
+
+    a.poll(force=True)
+    assert a.base.path == a.compact_path
+    assert (len(a.base), len(a.delta)) == (5300, 0)
+    # A worker started later maps the same file and has nothing left to replay
+    c = log_history(base, tmp_path)
+    assert (c.base.path, len(c.base), len(c.delta), c.compactions) == (a.compact_path, 5300, 0, 0)
+    assert_same_totals(c.similar_totals(50, 40.0, 3000000), a.similar_totals(50, 40.0, 3000000))
+
+
+def test_compacted_file_from_another_source_is_ignored(tmp_path):
+    a = log_history(base_store(), tmp_path)
+    append_rows(a, np.random.default_rng(7), 50)
+    assert a.compact() == 50
+    other = LiveHistory(synthetic_store(100, seed=2), log_path=a.log_path, compact_rows=10**9,
+                        compact_interval=3600, compact_path=a.compact_path, source={'syntheticRows': 100})
+    assert 'another history' in other.last_error
+    assert len(other) == 150
+
+
+def test_adopt_replays_log_from_snapshot_offset(tmp_path):
+    rng = np.random.default_rng(8)
+    live = log_history(base_store(), tmp_path)
+    append_rows(live, rng, 100)
+    offset = os.path.getsize(live.log_path)
+    append_rows(live, rng, 40)
+
+    # A snapshot built from the base plus the first 100 rows, as another process would publish it
+    columns = [np.concatenate([old, new]) for old, new in zip(
+        (live.base.amount, live.base.previous_transactions, live.base.account_age, live.base.fraud_score,
+         live.base.is_fraud),
+        live.delta.columns(100))]
+    HistoricalStore.from_columns(*columns).save(tmp_path / 'snapshot.fdhs', {'logOffset': offset})
+    before = live.similar_totals(50, 40.0, 3000000)
+
+    live._adopt(HistoricalStore.open(tmp_path / 'snapshot.fdhs'))
+    assert (len(live.base), len(live.delta), live.log_offset) == (5100, 40, os.path.getsize(live.log_path))
+    assert_same_totals(live.similar_totals(50, 40.0, 3000000), before)
+    assert_matches_scan(live, rng, queries=100)
+
+
+def test_shared_memory_compaction_publishes_next_generation(tmp_path):
+    name = f'lh-test-{uuid.uuid4().hex[:8]}'
+    publish(base_store(), name, {'source': SOURCE})
+    try:
+        log = str(tmp_path / 'decisions.ndjson')
+
+        def make():
+            shared = SharedStore(name)
+            return LiveHistory(shared.current(), log_path=log, compact_rows=10**9, compact_interval=3600,
+                               poll_interval=0, shared=shared, source=SOURCE)
+
+        a, b = make(), make()
+        generation = a.base.path
+        append_rows(a, np.random.default_rng(9), 200)
+        assert a.compact() == 200
+        b.poll(force=True)
+        for live in (a, b):
+            assert live.base.path != generation and live.base.path.startswith('shm:')
+            assert (len(live.base), len(live.delta)) == (5200, 0)
+        assert a.base.meta['source'] == SOURCE
+    finally:
+        unlink(name)
+
+
+def test_locks_are_fresh_after_fork():
+    live = LiveHistory(base_store(), compact_rows=10**9, compact_interval=3600)
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with live._lock, live._poll_lock, live._compact_lock:
+            held.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait()
+    try:
+        pid = os.fork()
+        if pid == 0:
+            # The holder thread does not exist here; inherited locks would never be released
+            ok = all(lock.acquire(timeout=2) for lock in (live._lock, live._poll_lock, live._compact_lock))
+            os._exit(0 if ok else 1)
+        assert os.waitpid(pid, 0)[1] == 0
+    finally:
+        release.set()
+        thread.join()
+
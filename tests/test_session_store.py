@@ -0,0 +1,30 @@
+# test_session_store.py - Session expiry in the SQLite backend when reads are buffered
+from session_store import SQLiteSessionStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_read_only_session_stays_alive_across_workers(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / 'sessions.db')
+    # Two stores on one database stand in for two workers
+    reader = SQLiteSessionStore(path, ttl_seconds=100, touch_seconds=30, clock=clock)
+    other = SQLiteSessionStore(path, ttl_seconds=100, touch_seconds=30, clock=clock)
+    reader.update('s', {'decision': 'approve'})
+
+    # Read every 20s for far longer than the TTL, with fewer reads than a touch batch
+    for _ in range(20):
+        clock.now += 20
+        assert reader.get('s') is not None
+    assert other.get('s') is not None
+    other.sweep()
+    assert reader.get('s') is not None
+
+    clock.now += 101
+    assert reader.get('s') is None
@@ -0,0 +1,152 @@
+# velocity.py - Server-side transaction velocity per user over sliding windows
+#
+# Hound otherwise only has the client's word for how busy an account is
+# (previousTransactions). The tracker counts the transactions the server
+# itself sees, per userName, over 1 minute, 1 hour and 24 hours.
+#
+# Each window is a ring of time buckets holding a count and an amount sum,
+# with running totals for the whole window, so recording a transaction and
+# reading a window are both O(1): moving the ring forward clears at most
+# `buckets` stale buckets. A window covers its last `buckets` buckets,
+# including the current partial one, so its trailing edge is exact to within
+# one bucket width (5 s, 5 min and 1 h for the default windows).
+#
+# Memory per user is fixed by the windows (about 1.2 KB by default). A user
+# idle for longer than the widest window only holds zeros and is dropped;
+# past max_users the least recently seen user is evicted.
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+# (name, seconds, buckets)
+WINDOWS = (('1m', 60, 12), ('1h', 3600, 12), ('24h', 86400, 24))
+
+
+class UserVelocity:
+    """Ring buffers for one user.
+
+    counts and amounts hold every window's buckets end to end, followed by
+    one running total per window; slots holds the bucket slot each window was
+    last advanced to.
+    """
+
+    __slots__ = ('counts', 'amounts', 'slots', 'last_seen')
+
+    def __init__(self, size, slots, now):
+        self.counts = array('I', bytes(4 * size))
+        self.amounts = array('d', bytes(8 * size))
+        self.slots = array('q', slots)
+        self.last_seen = now
+
+
+class VelocityTracker:
+    """Per-user transaction counts and amounts over sliding windows"""
+
+    def __init__(self, windows=WINDOWS, max_users=100000, clock=time.monotonic):
+        self.windows = []  # (name, bucket width, buckets, offset into the user's arrays)
+        offset = 0
+        for name, seconds, buckets in windows:
+            self.windows.append((name, seconds / buckets, buckets, offset))
+            offset += buckets
+        self.n_buckets = offset
+        self.idle_seconds = max(seconds for _, seconds, _ in windows)
+        self.feature_names = [(f'velocityCount{name}', f'velocityAmount{name}') for name, _, _ in windows]
+        self.max_users = max_users
+        self.clock = clock
+        self._users = OrderedDict()  # userName -> UserVelocity, least recently seen first
+        self._lock = threading.Lock()
+        self.observed = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _slots(self, now):
+        return [int(now // width) for _, width, _, _ in self.windows]
+
+    def _advance(self, user, now):
+        """Clear the buckets that have slid out of each window since the user was last touched"""
+        counts, amounts = user.counts, user.amounts
+        for w, (_, width, buckets, offset) in enumerate(self.windows):
+            slot = int(now // width)
+            last = user.slots[w]
+            if slot <= last:
+                continue
+            total = self.n_buckets + w
+            for s in range(last + 1, min(slot, last + buckets) + 1):
+                i = offset + s % buckets
+                counts[total] -= counts[i]
+                amounts[total] -= amounts[i]
+                counts[i] = 0
+                amounts[i] = 0.0
+            if counts[total] == 0:
+                # Drop float residue from the running subtraction
+                amounts[total] = 0.0
+            user.slots[w] = slot
+
+    def _features(self, user):
+        features = {}
+        for w, (count_name, amount_name) in enumerate(self.feature_names):
+            features[count_name] = user.counts[self.n_buckets + w]
+            features[amount_name] = user.amounts[self.n_buckets + w]
+        return features
+
+    def observe(self, user_name, amount):
+        """Record one transaction and return the user's velocity features, including it"""
+        if not isinstance(user_name, str) or not user_name:
+            return {}
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)):
+            amount = 0.0
+        now = self.clock()
+        with self._lock:
+            user = self._users.get(user_name)
+            if user is None:
+                user = self._users[user_name] = UserVelocity(self.n_buckets + len(self.windows), self._slots(now), now)
+            else:
+                self._users.move_to_end(user_name)
+                self._advance(user, now)
+            counts, amounts = user.counts, user.amounts
+            for w, (_, _, buckets, offset) in enumerate(self.windows):
+                for i in (offset + user.slots[w] % buckets, self.n_buckets + w):
+                    counts[i] += 1
+                    amounts[i] += amount
+            user.last_seen = now
+            self.observed += 1
+            self._sweep(now)
+            return self._features(user)
+
+    def features(self, user_name):
+        """The user's velocity features without recording anything"""
+        if not isinstance(user_name, str) or not user_name:
+            return {}
+        now = self.clock()
+        with self._lock:
+            user = self._users.get(user_name)
+            if user is None:
+                return {name: 0 for pair in self.feature_names for name in pair}
+            self._advance(user, now)
+            return self._features(user)
+
+    def _sweep(self, now):
+        while self._users:
+            user_name, user = next(iter(self._users.items()))
+            if now - user.last_seen <= self.idle_seconds:
+                break
+            del self._users[user_name]
+            self.expirations += 1
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._users)
+
+    def stats(self):
+        return {
+            'users': len(self._users),
+            'maxUsers': self.max_users,
+            'windows': {name: {'seconds': width * buckets, 'buckets': buckets} for name, width, buckets, _ in self.windows},
+            'bucketBytesPerUser': 12 * self.n_buckets + 20 * len(self.windows),
+            'observed': self.observed,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }